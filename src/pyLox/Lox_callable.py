@@ -6,6 +6,8 @@ from abc import ABC, abstractmethod
 from typing import Any, List
 
 class LoxCallable:
+    __slots__ = ()
+
     @abstractmethod
     def call(self, interpreter, arguments: list[Any]):
         pass
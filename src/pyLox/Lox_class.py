@@ -15,26 +15,24 @@ class LoxClass(LoxCallable, LoxInstance):
         self.super_class = super_class
         self.name = name
         self.methods = methods
+        # The class's method table holds the methods it inherits copied down from its superclass's table, overridden by its own,
+        # so looking a method up is a single access whatever the depth of the inheritance. Classes never change their methods.
+        self.method_table = {} if super_class is None else dict(super_class.method_table)
+        self.method_table.update(methods)
+        self.initializer = self.method_table.get("init")
+        self.initializer_arity = 0 if self.initializer is None else self.initializer.arity()
         
     def call(self, interpreter, arguments: list[Any]):
         instance = LoxInstance(self)
-        initializer = self.find_method("init")
-        if initializer is not None:
-            initializer.bind(instance).call(interpreter, arguments)
+        if self.initializer is not None:
+            self.initializer.bind(instance).call(interpreter, arguments)
         return instance
 
     def arity(self):
-        initializer = self.find_method("init")
-        if initializer is None:
-            return 0
-        return initializer.arity()
+        return self.initializer_arity
 
     def find_method(self, name: str):
-        if name in self.methods.keys():
-            return self.methods.get(name)
-        if self.super_class is not None:
-            return self.super_class.find_method(name)
-        return None
+        return self.method_table.get(name)
 
     def __str__(self):
         return self.name
\ No newline at end of file
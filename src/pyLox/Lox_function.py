@@ -7,42 +7,98 @@ from Lox_callable import LoxCallable
 #from stmt import Stmt, Expression,Print, Var, Block, If, While, Break, Fun, Return, Class
 from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
 from expr import Function
-from environment import Environment
-from error import ReturnException
+from environment import Cell
+from error import BreakException
 from function_type import FunctionType
+from lazy_body import LazyBody
 
+# The most frames of a function that are kept for its next calls, so deep recursion doesn't leave a lot of them behind.
+MAX_POOLED_FRAMES = 8
+
+# A call in tail position, which the tree-walker's return statement completes with instead of making the call.
+# The function whose body returned it makes the call in its place, so a chain of tail calls doesn't grow the Python stack.
+class TailCall:
+    __slots__ = ("function", "closure", "arguments")
+
+    def __init__(self, function: 'LoxFunction', closure: list[Cell], arguments: list[Any]):
+        self.function = function
+        self.closure = closure
+        self.arguments = arguments
+
+
+# The tree-walker's functions keep the cells they captured as their closure, the other engines keep the environment they were created in.
 class LoxFunction(LoxCallable):
-    def __init__(self, name: str, declaration: Function, closure: Environment, is_ini=False):
+    __slots__ = ("name", "declaration", "closure", "is_ini", "instance")
+
+    def __init__(self, name: str, declaration: Function, closure: 'list[Cell] or Environment', is_ini=False, instance=None):
         self.name = name
         self.declaration = declaration
         self.closure = closure
         self.is_ini = is_ini
+        # The instance a method is bound to, which an initializer returns.
+        self.instance = instance
 
     def call(self,interpreter, arguments: list[Any]):
-        environment = Environment(self.closure)
-        for i in range(len(arguments)):
-            environment.define(arguments[i])
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except ReturnException as ret:
-            if type(self.is_ini) is int:
-                return self.closure.get_at(0, self.is_ini)
-            return ret.value
-        if type(self.is_ini) is int:
-            return self.closure.get_at(0, self.is_ini)
-        return None
+        completion = self.run(interpreter, arguments, self.closure)
+        if self.is_ini:
+            return self.instance
+        if completion is None:
+            return None
+        return completion[0]
+
+    # This function calls a method on an instance without binding the method to it first, a method which refers to 'this'
+    # gets a cell holding the instance in a copy of its closure, the same way binding gives it one.
+    def invoke(self, interpreter, instance, arguments: list[Any]):
+        completion = self.run(interpreter, arguments, self.bound_closure(instance))
+        if self.is_ini:
+            return instance
+        if completion is None:
+            return None
+        return completion[0]
+
+    # The arguments take the first slots of the function's frame, the ones that inner functions capture are put in cells.
+    # Inner functions capture cells and never the frame itself, so the frame of a call that returned is reused by the next call,
+    # the variables of the body are always assigned before they're read, so the values left in the frame are never seen.
+    # When the body completes with a tail call, the called function's body runs next in the same loop, in place of the body that returned.
+    # The function returns how the last body completed.
+    def run(self, interpreter, arguments: list[Any], closure: list[Cell]):
+        declaration = self.declaration
+        while True:
+            if type(declaration.body) is LazyBody:
+                interpreter.load_body(declaration)
+            frames = declaration.frames
+            frame = frames.pop() if frames else [None] * declaration.frame_size
+            frame[:len(arguments)] = arguments
+            for slot in declaration.cells:
+                frame[slot] = Cell(frame[slot])
+            completion = interpreter.execute_body(declaration.body, frame, closure)
+            if len(frames) < MAX_POOLED_FRAMES:
+                frames.append(frame)
+            if type(completion) is not TailCall:
+                break
+            declaration = completion.function.declaration
+            closure = completion.closure
+            arguments = completion.arguments
+        # A break statement the body executed breaks the loop the function is called in.
+        if type(completion) is not tuple and completion is not None:
+            raise BreakException()
+        return completion
 
     def arity(self):
         return len(self.declaration.params)
     
     # This function binds a function to an instance.
     def bind(self, instance):
-        environment = Environment(self.closure)
-        environment.define(instance)
-        if type(self.is_ini) is bool and self.is_ini:
-            return LoxFunction(self.name, self.declaration, environment, len(environment.vars)-1)
-        else:
-            return LoxFunction(self.name, self.declaration, environment, self.is_ini)
+        return LoxFunction(self.name, self.declaration, self.bound_closure(instance), self.is_ini, instance)
+
+    # A method which refers to 'this' gets a copy of its closure with a cell holding the instance.
+    def bound_closure(self, instance) -> list[Cell]:
+        closure = self.closure
+        this_index = self.declaration.this_index
+        if this_index is not None:
+            closure = list(closure)
+            closure[this_index] = Cell(instance)
+        return closure
 
     def is_getter(self):
         return self.declaration.type_ == FunctionType.GETMETHOD
@@ -1,23 +1,36 @@
 '''
 The module houses the definition of an instance of a class in Lox - an object.
+An object keeps the values of its fields in a list, and its shape tells the index of each field in the list.
 '''
 from token import Token
+from error import LoxRunTimeError
+from shape import EMPTY
 
 class LoxInstance():
+    __slots__ = ("klass", "shape", "values")
+
     def __init__(self, klass):
         self.klass = klass
-        self.fields = {}
+        self.shape = EMPTY
+        self.values = []
 
     def get(self, name: Token):
-        if name.lexeme in self.fields.keys():
-            return self.fields.get(name.lexeme)
+        index = self.shape.indices.get(name.lexeme)
+        if index is not None:
+            return self.values[index]
         method = self.klass.find_method(name.lexeme)
         if method is not None:
             return method.bind(self)
         raise LoxRunTimeError(name,f"Undefined property {name.lexeme}.")
 
+    # Assigning a field the object doesn't have yet moves the object to the next shape, and appends the field's value.
     def set(self, name: Token, value):
-        self.fields[name.lexeme] = value
+        index = self.shape.indices.get(name.lexeme)
+        if index is not None:
+            self.values[index] = value
+        else:
+            self.shape = self.shape.add(name.lexeme)
+            self.values.append(value)
 
     def __str__(self):
         return f"{self.klass.name} instance" 
\ No newline at end of file
@@ -1,6 +1,6 @@
 '''
 The module serves as our parser, whose job is to transform the tokens into statements & expressions, and to perform a syntactic analysis.
-The parsing technique that is used is recursive descent.
+The parsing technique that is used is recursive descent, and precedence climbing for the expressions.
 The parser decides which statement or which expression is currently being parsed by a grammar that will be defined throught the file:
 The variables are defined before the '->' symbol.
 The terminals are encapsulated with "", excluding the 3 following terminals: NUMBER, STRING, IDENTIFIER.
@@ -17,14 +17,23 @@ from error_handler import ErrorHandler
 from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
 from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
 from var_state import VarState
+from precedence import Precedence
+from lazy_body import LazyBody
 
 class Parser:
 
-    def __init__(self, tokens: list[Token], error_handler: ErrorHandler):
-        self.tokens = tokens
+    # The tokens are either a list or a stream of tokens, the parser only keeps a window of three of them:
+    # the previous token, the current one and the one after it.
+    # A lazy parser skips over the function bodies, and a strict one still parses them to report their syntax errors.
+    def __init__(self, tokens: 'Iterable[Token]', error_handler: ErrorHandler, lazy=False, strict=False):
+        self.tokens = iter(tokens)
         self.error_handler = error_handler
-        self.current = 0    
+        self.previous_token = None
+        self.current_token = next(self.tokens)
+        self.next_token = next(self.tokens, None)
         self.loop_depth = 0
+        self.lazy = lazy
+        self.strict = strict
     
     '''
     The function transforms the list of tokens into a list of statements. 
@@ -84,9 +93,43 @@ class Parser:
                     if not self.match(TokenType.COMMA):
                         break
             self.consume(TokenType.RIGHT_PAREN,"Expect ')' after parameters.")
-        self.consume(TokenType.LEFT_BRACE,"Expect '{ before " + str(kind).lower() + " body.")
+        brace = self.consume(TokenType.LEFT_BRACE,"Expect '{ before " + str(kind).lower() + " body.")
+        if self.lazy and brace is not None:
+            return Function(params, self.skip_body(brace), kind)
         body = self.block_statement()
         return Function(params, body, kind)
+
+    # The function skips over a function body to its matching closing brace, and returns the body's tokens to be parsed later.
+    # A body that isn't closed is parsed right away, so its errors are reported the same way as in an eager parse.
+    def skip_body(self, brace: Token) -> LazyBody:
+        # The window is moved over the body directly, as this loop runs for almost every token in lazy mode.
+        tokens = []
+        depth = 1
+        previous, token, following = brace, self.current_token, self.next_token
+        while token.type_ != TokenType.EOF:
+            tokens.append(token)
+            if token.type_ == TokenType.LEFT_BRACE:
+                depth += 1
+            elif token.type_ == TokenType.RIGHT_BRACE:
+                depth -= 1
+            previous, token, following = token, following, next(self.tokens, None)
+            if depth == 0:
+                break
+        self.previous_token, self.current_token, self.next_token = previous, token, following
+        tokens.append(Token(TokenType.EOF, "", None, token.line))
+        body = LazyBody(brace, tokens, self.loop_depth)
+        if self.strict or depth > 0:
+            body.statements = self.parse_body(body)
+        return body
+
+    # The function parses the tokens of a skipped function body, the functions declared in it are parsed lazily as well.
+    def parse_body(self, body: LazyBody) -> list[Stmt]:
+        return Parser(body.tokens, self.error_handler, True, self.strict).lazy_body(body)
+
+    # The function parses a lazily parsed function body with a parser that was created for the body's tokens.
+    def lazy_body(self, body: LazyBody) -> list[Stmt]:
+        self.loop_depth = body.loop_depth
+        return self.block_statement()
         
     # classDecl -> "class" IDENTIFIER ("<" IDENTIFIER)? "{" function* "}"
     def class_declaration(self):
@@ -219,171 +262,173 @@ class Parser:
 
     # expression -> comma
     def expression(self) -> Expr:
-        return self.comma_op()
-
-    ''' In C, the comma operator has the lowest precedence,
-     and therefore it will be the first "level" in the descent
-     comma -> assignment ("," assignment )*";"
-     '''
-    def comma_op(self) -> Expr:
-        expr = self.assignment()
-        while self.match(TokenType.COMMA):
-            operator = self.previous()
-            right = self.assignment()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    # assignment -> conditional | (call ".")? IDENTIFIER "="  assignment 
-    def assignment(self) -> Expr:
-        expr = self.conditional()
-        if self.match(TokenType.EQUAL):
-            equals = self.previous()
-            value = self.assignment()
-            if type(expr) is Variable:
-                name = expr.name
-                return Assign(name, value)
-            elif type(expr) is Get:
-                return Set(expr.obj, expr.name, value)
-            self.error(equals, "Invalid assignment target.")
-        return expr
-
-    # conditional -> orExpr ("?" orExpr ":" orExpr)* ";"
-    def conditional(self) -> Expr:
-        expr = self.or_expr()
-        if self.match(TokenType.QUESTION):
-            then_branch = self.or_expr()
-            #self.consume(TokenType.COLON, " Expect ':' seperator after then branch in ternary conditional.")
-            else_branch = self.or_expr()
-            expr = Conditional(expr, then_branch, else_branch)
-        return expr
-
-    # orExpr -> andExpr ( "or" andExpr)*
-    def or_expr(self) -> Expr:
-        expr = self.and_expr()
-        while self.match(TokenType.OR):
-            operator = self.previous()
-            right = self.and_expr()
-            expr = Logical(expr, operator, right)
-        return expr
-
-    # andExpr -> equality ("and" equality)*
-    def and_expr(self) -> Expr:
-        expr = self.equality()
-        while self.match(TokenType.AND):
-            operator = self.previous()
-            right = self.equality()
-            expr = Logical(expr, operator, right)
-        return expr
-
-    # equality -> comparison (("!=" | "==") comparison)*
-    def equality(self) -> Expr:
-        expr = self.comparison()
-        while self.match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    # comparison -> term ((">" | ">=" | "<" | "<=") term)*
-    def comparison(self) -> Expr:
-        expr = self.term()
-        while self.match(TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL):
-            operator = self.previous()
-            right = self.term()
-            expr = Binary(expr, operator, right)
-        return expr
-
-    # term -> factor (("+" | "-") factor)*
-    def term(self) -> Expr:
-        expr = self.factor()
-        while self.match(TokenType.PLUS, TokenType.MINUS):
-            operator = self.previous()
-            right = self.factor()
-            expr = Binary(expr, operator, right)
-        return expr
-    
-    # factor -> unary (("/" | "*") unary)*
-    def factor(self) -> Expr:
+        return self.parse_precedence(Precedence.COMMA)
+
+    '''
+    The expressions are parsed by precedence climbing (a Pratt parser) instead of a function per level of the grammar:
+    comma       -> assignment ("," assignment)*
+    assignment  -> conditional | (call ".")? IDENTIFIER "=" assignment
+    conditional -> orExpr ("?" orExpr ":" orExpr)?
+    orExpr      -> andExpr ("or" andExpr)*
+    andExpr     -> equality ("and" equality)*
+    equality    -> comparison (("!=" | "==") comparison)*
+    comparison  -> term ((">" | ">=" | "<" | "<=") term)*
+    term        -> factor (("+" | "-") factor)*
+    factor      -> unary (("/" | "*") unary)*
+    The function parses an expression whose operators bind at least as tightly as the given level, by looking the current token up
+    in the infix table below. The ceiling keeps the grammar: after an operator, only operators which its level's production
+    may be followed by are taken - operators of the same level for the left associative ones, and only looser ones after the
+    conditional and the assignment, which appear once in their productions.
+    '''
+    def parse_precedence(self, level: Precedence) -> Expr:
         expr = self.unary()
-        while self.match(TokenType.SLASH, TokenType.STAR):
-            operator = self.previous()
-            right = self.unary()
-            expr = Binary(expr, operator, right)
-        return expr
+        ceiling = Precedence.CALL
+        while True:
+            rule = self.infix_rules.get(self.current_token.type_)
+            if rule is None:
+                return expr
+            precedence, parse_infix = rule
+            if precedence < level or precedence > ceiling:
+                return expr
+            expr, ceiling = parse_infix(self, expr, self.advance(), precedence)
+
+    # The infix functions return the parsed expression and the ceiling of the operators that may follow it.
+    def binary(self, left: Expr, operator: Token, precedence: Precedence) -> tuple:
+        right = self.parse_precedence(precedence + 1)
+        return Binary(left, operator, right), precedence
+
+    def logical(self, left: Expr, operator: Token, precedence: Precedence) -> tuple:
+        right = self.parse_precedence(precedence + 1)
+        return Logical(left, operator, right), precedence
+
+    # The scanner drops the ':' seperator, so the else branch follows the then branch right away.
+    def conditional(self, condition: Expr, question: Token, precedence: Precedence) -> tuple:
+        then_branch = self.parse_precedence(Precedence.OR)
+        else_branch = self.parse_precedence(Precedence.OR)
+        return Conditional(condition, then_branch, else_branch), precedence - 1
+
+    def assignment(self, target: Expr, equals: Token, precedence: Precedence) -> tuple:
+        value = self.parse_precedence(Precedence.ASSIGNMENT)
+        if type(target) is Variable:
+            return Assign(target.name, value), precedence - 1
+        elif type(target) is Get:
+            return Set(target.obj, target.name, value), precedence - 1
+        self.error(equals, "Invalid assignment target.")
+        return target, precedence - 1
+
+    # The infix operators, by token type, with their precedences and the functions which parse them.
+    infix_rules = {
+                   TokenType.COMMA : (Precedence.COMMA, binary),
+                   TokenType.EQUAL : (Precedence.ASSIGNMENT, assignment),
+                   TokenType.QUESTION : (Precedence.CONDITIONAL, conditional),
+                   TokenType.OR : (Precedence.OR, logical),
+                   TokenType.AND : (Precedence.AND, logical),
+                   TokenType.BANG_EQUAL : (Precedence.EQUALITY, binary),
+                   TokenType.EQUAL_EQUAL : (Precedence.EQUALITY, binary),
+                   TokenType.GREATER : (Precedence.COMPARISON, binary),
+                   TokenType.GREATER_EQUAL : (Precedence.COMPARISON, binary),
+                   TokenType.LESS : (Precedence.COMPARISON, binary),
+                   TokenType.LESS_EQUAL : (Precedence.COMPARISON, binary),
+                   TokenType.PLUS : (Precedence.TERM, binary),
+                   TokenType.MINUS : (Precedence.TERM, binary),
+                   TokenType.SLASH : (Precedence.FACTOR, binary),
+                   TokenType.STAR : (Precedence.FACTOR, binary)
+                  }
 
     # unary -> (("!" | "-") unary) | call
+    # call -> primary ( "(" arguments? ") | "." IDENTIFIER)*
     def unary(self) -> Expr:
-        if self.match(TokenType.BANG, TokenType.MINUS):
-            operator = self.previous()
+        token = self.current_token
+        if token.type_ == TokenType.BANG or token.type_ == TokenType.MINUS:
+            self.advance()
             right = self.unary()
-            return Unary(operator, right)
-        return self.call()
-
-    # call -> primary ( "(" arguments? ") | "." IDENTIFIER)*
-    def call(self) -> Expr:
-        expr = self.primary()
+            return Unary(token, right)
+        parse_prefix = self.prefix_rules.get(token.type_)
+        if parse_prefix is None:
+            self.error_handler.error_on_token(token, "Expect expression.")
+            expr = None
+        else:
+            self.advance()
+            expr = parse_prefix(self, token)
         while True:
-            if self.match(TokenType.LEFT_PAREN):
+            type_ = self.current_token.type_
+            if type_ == TokenType.LEFT_PAREN:
+                self.advance()
                 expr = self.finish_call(expr)
-            elif self.match(TokenType.DOT):
+            elif type_ == TokenType.DOT:
+                self.advance()
                 name = self.consume(TokenType.IDENTIFIER,"Expect name after '.'.")
                 expr = Get(expr, name)
             else:
-                break   
-        return expr
+                return expr
 
+    # The prefix functions parse the expressions which start with the given token, that was already consumed.
     # primary -> "true" | "false" | "nil" | NUMBER | STRING | "fun" functionBody | grouping | IDENTIFIER 
-    def primary(self) -> Expr:
-        if self.match(TokenType.TRUE):
+    def literal(self, token: Token) -> Expr:
+        if token.type_ == TokenType.TRUE:
             return Literal(True)
-        if self.match(TokenType.FALSE):
+        if token.type_ == TokenType.FALSE:
             return Literal(False)
-        if self.match(TokenType.NIL):
+        if token.type_ == TokenType.NIL:
             return Literal(None)
-        if self.match(TokenType.NUMBER, TokenType.STRING):
-            return Literal(self.previous().literal)
-        if self.match(TokenType.FUN):
-            return self.function_body(FunctionType.FUNCTION)
-        # grouping -> "(" expression ")"
-        if self.match(TokenType.LEFT_PAREN):
-            expr = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
-            return Grouping(expr)
-        if self.match(TokenType.THIS):
-            return This(self.previous())
-        if self.match(TokenType.SUPER):
-            keyword = self.previous()
-            self.consume(TokenType.DOT,"Expect '.' after super.")
-            method = self.consume(TokenType.IDENTIFIER,"Expect superclass method name.")
-            return Super(keyword, method)
-        if self.match(TokenType.IDENTIFIER):
-            return Variable(self.previous())
-        # The following if clauses are productions for missing left operands - "error productions"
-        if self.match(TokenType.COMMA):
-            self.error(self.previous(), "Missing left-hand operand.")
-            self.comma_op()
-            return None
-        if self.match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            self.error(self.previous(), "Missing left-hand operand.")
-            self.equality()
-            return None
-        if self.match(TokenType.QUESTION):
-            self.error(self.previous(), "Missing condition expression for ternary conditional.")
-            self.conditional()
-            return None
-        if self.match(TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL):
-            self.error(self.previous(), "Missing left-hand operand.")
-            self.comparison()
-            return None
-        if self.match(TokenType.PLUS):
-            self.error(self.previous(), "Missing left-hand operand.")
-            self.term()
-            return None
-        if self.match(TokenType.SLASH, TokenType.STAR):
-            self.error(self.previous(), "Missing left-hand operand.")
-            self.factor()
-            return None
-        self.error_handler.error_on_token(self.peek(), "Expect expression.")
+        return Literal(token.literal)
+
+    def lambda_(self, keyword: Token) -> Expr:
+        return self.function_body(FunctionType.FUNCTION)
+
+    # grouping -> "(" expression ")"
+    def grouping(self, paren: Token) -> Expr:
+        expr = self.expression()
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+        return Grouping(expr)
+
+    def this(self, keyword: Token) -> Expr:
+        return This(keyword)
+
+    def super_(self, keyword: Token) -> Expr:
+        self.consume(TokenType.DOT,"Expect '.' after super.")
+        method = self.consume(TokenType.IDENTIFIER,"Expect superclass method name.")
+        return Super(keyword, method)
+
+    def variable(self, name: Token) -> Expr:
+        return Variable(name)
+
+    # The following functions are productions for missing left operands - "error productions",
+    # they parse the right operand at the operator's level and discard it.
+    def missing_operand(self, operator: Token) -> Expr:
+        self.error(operator, "Missing left-hand operand.")
+        self.parse_precedence(self.infix_rules[operator.type_][0])
+        return None
+
+    def missing_condition(self, question: Token) -> Expr:
+        self.error(question, "Missing condition expression for ternary conditional.")
+        self.parse_precedence(Precedence.CONDITIONAL)
+        return None
+
+    # The expressions, by their first token, with the functions which parse them.
+    prefix_rules = {
+                    TokenType.TRUE : literal,
+                    TokenType.FALSE : literal,
+                    TokenType.NIL : literal,
+                    TokenType.NUMBER : literal,
+                    TokenType.STRING : literal,
+                    TokenType.FUN : lambda_,
+                    TokenType.LEFT_PAREN : grouping,
+                    TokenType.THIS : this,
+                    TokenType.SUPER : super_,
+                    TokenType.IDENTIFIER : variable,
+                    TokenType.COMMA : missing_operand,
+                    TokenType.BANG_EQUAL : missing_operand,
+                    TokenType.EQUAL_EQUAL : missing_operand,
+                    TokenType.QUESTION : missing_condition,
+                    TokenType.GREATER : missing_operand,
+                    TokenType.GREATER_EQUAL : missing_operand,
+                    TokenType.LESS : missing_operand,
+                    TokenType.LESS_EQUAL : missing_operand,
+                    TokenType.PLUS : missing_operand,
+                    TokenType.SLASH : missing_operand,
+                    TokenType.STAR : missing_operand
+                   }
 
     # arguments -> expression ("," expression)*
     def finish_call(self, callee: Call) -> Expr:
@@ -392,7 +437,7 @@ class Parser:
             while True:
                 if len(arguments) >= 255:
                     self.error(self.peek(), "Cant have more than 255 arguments. ")
-                arguments.append(self.conditional())
+                arguments.append(self.parse_precedence(Precedence.CONDITIONAL))
                 if not self.match(TokenType.COMMA):
                     break
         paren = self.consume(TokenType.RIGHT_PAREN,"Expect ')' after arguments.")
@@ -415,23 +460,25 @@ class Parser:
     def check_next(self, type_: TokenType) -> bool:
         if self.is_at_end():
             return False
-        if self.tokens[self.current+1].type_ == TokenType.EOF:
+        if self.next_token.type_ == TokenType.EOF:
             return False
-        return self.tokens[self.current+1].type_ == type_
+        return self.next_token.type_ == type_
     
     def is_at_end(self) -> bool:
         return self.peek().type_ == TokenType.EOF
     
     def peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.current_token
 
     def advance(self) -> Token:
         if not self.is_at_end():
-            self.current += 1
+            self.previous_token = self.current_token
+            self.current_token = self.next_token
+            self.next_token = next(self.tokens, None)
         return self.previous()
 
     def previous(self) -> Token:
-        return self.tokens[self.current-1]
+        return self.previous_token
     
     def consume(self, type_: TokenType, message: str) -> Token:
         if self.check(type_):
@@ -0,0 +1,5 @@
+from enum import Enum
+
+# How a resolved variable is reached from the code that refers to it, a global variable has no access.
+# LOCAL - a slot of the current frame, CELL - a cell in a slot of the current frame, UPVALUE - a cell captured by the current function.
+Access = Enum("Access", "LOCAL CELL UPVALUE")
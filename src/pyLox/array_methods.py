@@ -8,6 +8,8 @@ class _Get(LoxCallable):
 
     def call(self, interpreter, arguments):
         index = arguments[0]
+        if type(index) is not int:
+            raise LoxRunTimeError(self.name,"Array index must be an integer.")
         if index < len(self.outer.elements):
             return self.outer.elements[index]
         else:
@@ -25,10 +27,9 @@ class _Set(LoxCallable):
         index = arguments[0]
         value = arguments[1]
         if index is not None:
-            if type(index) is int or (type(index) is float and index.is_integer()):
-                index = int(index)
+            if type(index) is int:
                 if index >= 0 and index < len(self.outer.elements):
-                    self.outer.elements[int(index)] = value
+                    self.outer.elements[index] = value
                 else:
                     raise LoxRunTimeError(self.name,"Array index out of range.")
             else:
@@ -44,7 +45,7 @@ class _Length(LoxCallable):
         self.outer = outer
     
     def call(self, interpreter, arguments):
-        return float(len(self.outer.elements))
+        return len(self.outer.elements)
 
     def arity(self):
         return 0
\ No newline at end of file
@@ -5,15 +5,15 @@ to compare their printer to mine.
 from visitor import Visitor
 from token import Token
 from token_type import TokenType
-from stmt import Expression, Print, Var, If, While, Fun, Return, Break
+from stmt import Expression, Var, If, While, Fun, Return, Break
 from expr import Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call
 
 class AstPrinter(Visitor):
     def __init__(self):
-        pass
+        self.visits = self.dispatch_table()
 
     def print(self, expr) -> str:
-        return expr.accept(self)
+        return self.visits[expr.kind](expr)
 
     def visit_binary_expr(self, expr: Binary) -> str:
         return self.parenthesize(expr.operator.lexeme ,expr.left, expr.right)
@@ -32,6 +32,6 @@ class AstPrinter(Visitor):
     def parenthesize(self, name: str, *exprs) -> str:
         builder = f"({name}"
         for expr in exprs:
-            builder += f" {expr.accept(self)}"
+            builder += f" {self.visits[expr.kind](expr)}"
         builder += ")"
         return builder
\ No newline at end of file
@@ -0,0 +1,515 @@
+'''
+The module serves as the closure compiler, an alternative to the tree-walker which converts every resolved statement and expression
+into a Python closure once, before the program runs.
+Each closure receives the current environment and already knows its operator, variable depth and slot, so executing a node is a single
+call instead of an accept/visit round trip followed by a search through the resolution tables.
+Expression closures return their value. Statement closures return None when they complete normally, BREAK when a break statement was
+executed, or a one item tuple holding the returned value when a return statement was executed.
+'''
+from typing import Any, Callable
+from visitor import Visitor
+from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
+from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
+from token import Token
+from token_type import TokenType
+from error import LoxRunTimeError, DivisionByZeroError, BreakException
+from error_handler import ErrorHandler
+from environment import Environment
+from run_mode import RunMode
+from Lox_callable import LoxCallable
+from Lox_function import LoxFunction, TailCall, MAX_POOLED_FRAMES
+from Lox_class import LoxClass
+from Lox_instance import LoxInstance
+from interpreter import Interpreter, BREAK
+from numeric import divide as divide_numbers, negate as negate_number, add as add_numbers, subtract as subtract_numbers, multiply as multiply_numbers
+
+
+# A Lox function whose body was compiled into a closure.
+class ClosureFunction(LoxFunction):
+    __slots__ = ("body",)
+
+    def __init__(self, name: str, declaration: Function, closure: Environment, body: Callable, is_ini=False):
+        super().__init__(name, declaration, closure, is_ini)
+        self.body = body
+
+    # The arguments list is created for the call, so it becomes the environment's variables as it is.
+    # The environment of a call is reused by the next call, unless the function creates functions which may have captured it.
+    # When the body completes with a tail call, the called function's body runs next in the same loop.
+    def call(self, interpreter, arguments: list[Any]):
+        function = self
+        closure = self.closure
+        while True:
+            declaration = function.declaration
+            frames = declaration.frames
+            if frames:
+                environment = frames.pop()
+                environment.enclosing = closure
+            else:
+                environment = Environment(closure)
+            environment.vars = arguments
+            result = function.body(environment)
+            if not declaration.encloses and len(frames) < MAX_POOLED_FRAMES:
+                frames.append(environment)
+            if type(result) is not TailCall:
+                break
+            function = result.function
+            closure = result.closure
+            arguments = result.arguments
+        # A break statement the body executed breaks the loop the function is called in.
+        if result is BREAK:
+            raise BreakException()
+        if type(self.is_ini) is int:
+            return self.closure.vars[self.is_ini]
+        if result is None:
+            return None
+        return result[0]
+
+    # This function binds a function to an instance.
+    def bind(self, instance):
+        environment = Environment(self.closure)
+        environment.define(instance)
+        if type(self.is_ini) is bool and self.is_ini:
+            return ClosureFunction(self.name, self.declaration, environment, self.body, len(environment.vars)-1)
+        return ClosureFunction(self.name, self.declaration, environment, self.body, self.is_ini)
+
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, error_handler: ErrorHandler):
+        super().__init__(error_handler)
+        self.environment = None
+
+    def interpret(self, statements: list[Stmt], mode: RunMode):
+        try:
+            compiler = ClosureCompiler(self)
+            for statement in statements:
+                compiler.compile_by_mode(statement, mode)(self.environment)
+        except LoxRunTimeError as error:
+            self.error_handler.runtime_error(error)
+
+
+class ClosureCompiler(Visitor):
+    def __init__(self, interpreter: ClosureInterpreter):
+        self.interpreter = interpreter
+        # The number of environments that exist at runtime on top of the globals, counted within the current function.
+        self.env_depth = 0
+
+    def compile_by_mode(self, statement: Stmt, mode: RunMode) -> Callable:
+        if mode == RunMode.REPL and type(statement) is Expression and type(statement.expr) is not Assign and type(statement.expr) is not Call:
+            expr = self.compile(statement.expr)
+            stringify = self.interpreter.stringify
+            def echo(env):
+                print(stringify(expr(env)))
+            return echo
+        return self.compile(statement)
+
+    def compile(self, node: 'Stmt or Expr') -> Callable:
+        return node.accept(self)
+
+    # The function compiles a list of statements that are executed in the environment they receive.
+    def compile_sequence(self, statements: list[Stmt]) -> Callable:
+        compiled = tuple(self.compile(statement) for statement in statements)
+        if len(compiled) == 1:
+            return compiled[0]
+        def sequence(env):
+            for statement in compiled:
+                result = statement(env)
+                if result is not None:
+                    return result
+            return None
+        return sequence
+
+    def compile_function(self, function: Function) -> Callable:
+        enclosing_depth = self.env_depth
+        self.env_depth = 1
+        body = self.compile_sequence(function.body)
+        self.env_depth = enclosing_depth
+        return body
+
+    # The function returns a closure that defines a new variable, in the current environment or in the globals.
+    def definer(self, name: Token) -> Callable:
+        if self.env_depth > 0:
+            def define_local(env, value):
+                env.vars.append(value)
+            return define_local
+        globals_ = self.interpreter.globals
+        lexeme = name.lexeme
+        def define_global(env, value):
+            globals_[lexeme] = value
+        return define_global
+
+    # The function returns a closure that reads a variable at its resolved address, or from the globals.
+    def reader(self, expr: Expr, name: Token) -> Callable:
+        uninitialized = Interpreter.uninitialized
+        depth = expr.depth
+        if depth is None:
+            globals_ = self.interpreter.globals
+            lexeme = name.lexeme
+            def get_global(env):
+                if lexeme not in globals_:
+                    raise LoxRunTimeError(name, f"Undefined variable {lexeme}.")
+                value = globals_[lexeme]
+                if value is uninitialized:
+                    raise LoxRunTimeError(name, "Variable must be initialized before use.")
+                return value
+            return get_global
+        slot = expr.slot
+        if depth == 0:
+            def get_local(env):
+                value = env.vars[slot]
+                if value is uninitialized:
+                    raise LoxRunTimeError(name, "Variable must be initialized before use.")
+                return value
+            return get_local
+        if depth == 1:
+            def get_enclosing(env):
+                value = env.enclosing.vars[slot]
+                if value is uninitialized:
+                    raise LoxRunTimeError(name, "Variable must be initialized before use.")
+                return value
+            return get_enclosing
+        def get_ancestor(env):
+            for _ in range(depth):
+                env = env.enclosing
+            value = env.vars[slot]
+            if value is uninitialized:
+                raise LoxRunTimeError(name, "Variable must be initialized before use.")
+            return value
+        return get_ancestor
+
+    def visit_expression_stmt(self, stmt: Expression) -> Callable:
+        expr = self.compile(stmt.expr)
+        def expression(env):
+            expr(env)
+        return expression
+
+    def visit_var_stmt(self, stmt: Var) -> Callable:
+        define = self.definer(stmt.name)
+        if stmt.initializer is None:
+            uninitialized = Interpreter.uninitialized
+            def declare(env):
+                define(env, uninitialized)
+            return declare
+        initializer = self.compile(stmt.initializer)
+        def var(env):
+            define(env, initializer(env))
+        return var
+
+    # A block without a scope of its own runs in the environment it receives.
+    def visit_block_stmt(self, stmt: Block) -> Callable:
+        if not stmt.scoped:
+            return self.compile_sequence(stmt.statements)
+        self.env_depth += 1
+        body = self.compile_sequence(stmt.statements)
+        self.env_depth -= 1
+        def block(env):
+            return body(Environment(env))
+        return block
+
+    def visit_if_stmt(self, stmt: If) -> Callable:
+        condition = self.compile(stmt.condition)
+        then_branch = self.compile(stmt.then_branch)
+        if stmt.else_branch is None:
+            def if_then(env):
+                value = condition(env)
+                if value is not None and value is not False:
+                    return then_branch(env)
+                return None
+            return if_then
+        else_branch = self.compile(stmt.else_branch)
+        def if_then_else(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            return else_branch(env)
+        return if_then_else
+
+    # A function called in the loop which executes a break statement breaks the loop by raising BreakException.
+    def visit_while_stmt(self, stmt: While) -> Callable:
+        condition = self.compile(stmt.condition)
+        body = self.compile(stmt.body)
+        def while_loop(env):
+            try:
+                while True:
+                    value = condition(env)
+                    if value is None or value is False:
+                        return None
+                    result = body(env)
+                    if result is not None:
+                        if result is BREAK:
+                            return None
+                        return result
+            except BreakException:
+                return None
+        return while_loop
+
+    def visit_break_stmt(self, stmt: Break) -> Callable:
+        def break_loop(env):
+            return BREAK
+        return break_loop
+
+    def visit_return_stmt(self, stmt: Return) -> Callable:
+        if stmt.value is None:
+            def return_nil(env):
+                return (None,)
+            return return_nil
+        if type(stmt.value) is Call and stmt.value.tail:
+            return self.visit_call_expr(stmt.value, True)
+        value = self.compile(stmt.value)
+        def return_value(env):
+            return (value(env),)
+        return return_value
+
+    def visit_fun_stmt(self, stmt: Fun) -> Callable:
+        define = self.definer(stmt.name)
+        name = stmt.name.lexeme
+        declaration = stmt.function
+        body = self.compile_function(declaration)
+        def fun(env):
+            define(env, ClosureFunction(name, declaration, env, body))
+        return fun
+
+    def visit_class_stmt(self, stmt: Class) -> Callable:
+        define = self.definer(stmt.name)
+        name = stmt.name
+        super_class = self.compile(stmt.super_class) if stmt.super_class is not None else None
+        methods = [(method.name.lexeme, method.function, self.compile_function(method.function)) for method in stmt.methods]
+        class_methods = [(method.name.lexeme, method.function, self.compile_function(method.function)) for method in stmt.class_methods]
+        slot = stmt.slot if self.env_depth > 0 else None
+        globals_ = self.interpreter.globals
+        def klass(env):
+            define(env, None)
+            superclass = None
+            closure = env
+            if super_class is not None:
+                superclass = super_class(env)
+                if not isinstance(superclass, LoxClass):
+                    raise LoxRunTimeError(stmt.super_class.name, "Superclass must be a class.")
+                closure = Environment(env)
+                closure.define(superclass)
+            statics = {method: ClosureFunction(method, declaration, closure, body) for method, declaration, body in class_methods}
+            metaclass = LoxClass(None, None, f'{name.lexeme}metaclass', statics)
+            functions = {method: ClosureFunction(method, declaration, closure, body, method == 'init') for method, declaration, body in methods}
+            lox_class = LoxClass(metaclass, superclass, name.lexeme, functions)
+            if env:
+                env.vars[slot] = lox_class
+            else:
+                globals_[name.lexeme] = lox_class
+        return klass
+
+    def visit_assign_expr(self, expr: Assign) -> Callable:
+        value = self.compile(expr.value)
+        name = expr.name
+        depth = expr.depth
+        if depth is None:
+            globals_ = self.interpreter.globals
+            lexeme = name.lexeme
+            def assign_global(env):
+                result = value(env)
+                if lexeme not in globals_:
+                    raise LoxRunTimeError(name, f"Undefined variable {lexeme}.")
+                globals_[lexeme] = result
+                return result
+            return assign_global
+        slot = expr.slot
+        if depth == 0:
+            def assign_local(env):
+                result = value(env)
+                env.vars[slot] = result
+                return result
+            return assign_local
+        def assign_ancestor(env):
+            result = value(env)
+            for _ in range(depth):
+                env = env.enclosing
+            env.vars[slot] = result
+            return result
+        return assign_ancestor
+
+    def visit_binary_expr(self, expr: Binary) -> Callable:
+        left = self.compile(expr.left)
+        right = self.compile(expr.right)
+        operator = expr.operator
+        type_ = operator.type_
+        if type_ == TokenType.PLUS:
+            stringify = self.interpreter.stringify
+            def add(env):
+                a = left(env)
+                b = right(env)
+                if (type(a) is float or type(a) is int) and (type(b) is float or type(b) is int):
+                    return add_numbers(a, b)
+                if type(a) is str or type(b) is str:
+                    return stringify(a) + stringify(b)
+                raise LoxRunTimeError(operator, "Operands must either strings or numbers.")
+            return add
+        if type_ == TokenType.MINUS:
+            def subtract(env):
+                a = left(env)
+                b = right(env)
+                if (type(a) is not float and type(a) is not int) or (type(b) is not float and type(b) is not int):
+                    raise LoxRunTimeError(operator, "Operands must be numbers.")
+                return subtract_numbers(a, b)
+            return subtract
+        if type_ == TokenType.STAR:
+            def multiply(env):
+                a = left(env)
+                b = right(env)
+                if (type(a) is not float and type(a) is not int) or (type(b) is not float and type(b) is not int):
+                    raise LoxRunTimeError(operator, "Operands must be numbers.")
+                return multiply_numbers(a, b)
+            return multiply
+        if type_ == TokenType.SLASH:
+            def divide(env):
+                a = left(env)
+                b = right(env)
+                if b == 0:
+                    raise DivisionByZeroError(operator)
+                if (type(a) is not float and type(a) is not int) or (type(b) is not float and type(b) is not int):
+                    raise LoxRunTimeError(operator, "Operands must be numbers.")
+                return divide_numbers(a, b)
+            return divide
+        if type_ == TokenType.COMMA:
+            def comma(env):
+                left(env)
+                return right(env)
+            return comma
+        op_func = Interpreter.op_dic[type_]
+        def compare(env):
+            a = left(env)
+            b = right(env)
+            if not ((type(a) is str and type(b) is str) or
+                    ((type(a) is float or type(a) is int) and (type(b) is float or type(b) is int))):
+                raise LoxRunTimeError(operator, "Operands must all be of the same type.")
+            return op_func(a, b)
+        return compare
+
+    # The tree-walker evaluates both branches before choosing one, and so does the compiled closure.
+    def visit_conditional_expr(self, expr: Conditional) -> Callable:
+        condition = self.compile(expr.condition)
+        then_branch = self.compile(expr.then_branch)
+        else_branch = self.compile(expr.else_branch)
+        def conditional(env):
+            value = condition(env)
+            then_value = then_branch(env)
+            else_value = else_branch(env)
+            if value is None or value is False:
+                return else_value
+            return then_value
+        return conditional
+
+    def visit_grouping_expr(self, expr: Grouping) -> Callable:
+        return self.compile(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal) -> Callable:
+        value = expr.value
+        def literal(env):
+            return value
+        return literal
+
+    def visit_logical_expr(self, expr: Logical) -> Callable:
+        left = self.compile(expr.left)
+        right = self.compile(expr.right)
+        if expr.operator.type_ == TokenType.OR:
+            def logical_or(env):
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+            return logical_or
+        def logical_and(env):
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+        return logical_and
+
+    def visit_unary_expr(self, expr: Unary) -> Callable:
+        right = self.compile(expr.right)
+        if expr.operator.type_ == TokenType.MINUS:
+            def negate(env):
+                return negate_number(right(env))
+            return negate
+        def logical_not(env):
+            value = right(env)
+            return value is None or value is False
+        return logical_not
+
+    def visit_variable_expr(self, expr: Variable) -> Callable:
+        return self.reader(expr, expr.name)
+
+    def visit_function_expr(self, expr: Function) -> Callable:
+        body = self.compile_function(expr)
+        def function(env):
+            return ClosureFunction(None, expr, env, body)
+        return function
+
+    # A call in tail position compiles into a return statement's closure, which completes with the tail call instead of making it,
+    # unless the callee is an initializer or isn't a compiled function.
+    def visit_call_expr(self, expr: Call, tail=False) -> Callable:
+        callee = self.compile(expr.callee)
+        args = tuple(self.compile(arg) for arg in expr.args)
+        paren = expr.paren
+        interpreter = self.interpreter
+        if tail:
+            def tail_call(env):
+                function = callee(env)
+                if not isinstance(function, LoxCallable):
+                    raise LoxRunTimeError(paren, "Can only call functions and classes.")
+                arguments = [arg(env) for arg in args]
+                if len(arguments) != function.arity():
+                    raise LoxRunTimeError(paren, f"Expected {function.arity()} arguments but got {len(arguments)}.")
+                if type(function) is ClosureFunction and function.is_ini is False:
+                    return TailCall(function, function.closure, arguments)
+                return (function.call(interpreter, arguments),)
+            return tail_call
+        def call(env):
+            function = callee(env)
+            if not isinstance(function, LoxCallable):
+                raise LoxRunTimeError(paren, "Can only call functions and classes.")
+            arguments = [arg(env) for arg in args]
+            if len(arguments) != function.arity():
+                raise LoxRunTimeError(paren, f"Expected {function.arity()} arguments but got {len(arguments)}.")
+            return function.call(interpreter, arguments)
+        return call
+
+    def visit_get_expr(self, expr: Get) -> Callable:
+        obj = self.compile(expr.obj)
+        name = expr.name
+        interpreter = self.interpreter
+        def get(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise LoxRunTimeError(name, "Only instances have properties.")
+            result = instance.get(name)
+            if isinstance(result, LoxFunction) and result.is_getter():
+                result = result.call(interpreter, [])
+            return result
+        return get
+
+    def visit_set_expr(self, expr: Set) -> Callable:
+        obj = self.compile(expr.obj)
+        value = self.compile(expr.value)
+        name = expr.name
+        def set_property(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise LoxRunTimeError(name, "Only instances have properties.")
+            result = value(env)
+            instance.set(name, result)
+            return result
+        return set_property
+
+    def visit_this_expr(self, expr: This) -> Callable:
+        return self.reader(expr, expr.keyword)
+
+    def visit_super_expr(self, expr: Super) -> Callable:
+        depth = expr.depth
+        slot = expr.slot
+        method_name = expr.method
+        def super_method(env):
+            super_class = env.get_at(depth, slot)
+            obj = env.get_at(depth - 1, 0)
+            method = super_class.find_method(method_name.lexeme)
+            if method is None:
+                raise LoxRunTimeError(method_name, f"Undefined propery {method_name.lexeme}.")
+            return method.bind(obj)
+        return super_method
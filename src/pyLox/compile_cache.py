@@ -0,0 +1,70 @@
+'''
+The module houses the compile cache, a directory - like Python's __pycache__ - which stores the products of compiling a Lox source file
+so that the next run of the same source can skip the work.
+Entries are keyed by a hash of the source together with the interpreter's version, so editing the source or the interpreter
+automatically invalidates them. Failing to read or write the cache is never an error, the program is simply compiled again.
+'''
+import os
+import sys
+import hashlib
+
+CACHE_DIRECTORY = "__loxcache__"
+# Bump the version whenever the format of a cached entry changes.
+CACHE_VERSION = 3
+# The number of characters read at a time when hashing a source file.
+CHUNK_SIZE = 1 << 16
+_interpreter_version = None
+
+
+# The interpreter's version is a fingerprint of its modules, so changing any of them - the syntax tree classes for example - invalidates
+# the cache the same way Python's __pycache__ follows the modification time of a module.
+def interpreter_version() -> str:
+    global _interpreter_version
+    if _interpreter_version is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        fingerprint = hashlib.sha256(f"{CACHE_VERSION}-{sys.implementation.cache_tag}".encode("utf-8"))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                stat = os.stat(os.path.join(directory, name))
+                fingerprint.update(f"{name}-{stat.st_mtime_ns}-{stat.st_size}".encode("utf-8"))
+        _interpreter_version = fingerprint.hexdigest()
+    return _interpreter_version
+
+
+class CompileCache:
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, CACHE_DIRECTORY)
+
+    # The function returns the key of a source, which is either a string or a text file that is read in chunks and rewound.
+    def key(self, source: 'str or TextIO') -> str:
+        key = hashlib.sha256()
+        if isinstance(source, str):
+            key.update(source.encode("utf-8"))
+        else:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), ""):
+                key.update(chunk.encode("utf-8"))
+            source.seek(0)
+        return key.hexdigest()
+
+    # The function returns the path of the entry of the given kind for the source with the given key.
+    def path(self, key: str, kind: str) -> str:
+        name = hashlib.sha256(f"{key}-{kind}-{interpreter_version()}".encode("utf-8"))
+        return os.path.join(self.directory, f"{kind}-{name.hexdigest()}.loxc")
+
+    def load(self, key: str, kind: str) -> bytes:
+        try:
+            with open(self.path(key, kind), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, key: str, kind: str, data: bytes):
+        path = self.path(key, kind)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            pass
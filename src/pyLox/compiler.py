@@ -0,0 +1,288 @@
+'''
+The module serves as the bytecode compiler, whose job is to translate resolved statements and expressions into chunks of bytecode
+that are executed by the virtual machine in vm.py.
+The compiler walks the tree once with the visitor pattern. Local variables are addressed by the depth and slot that the resolver
+handed to the interpreter, so the virtual machine uses the same environments as the tree-walker and behaves the same way.
+'''
+from typing import Any
+from visitor import Visitor
+from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
+from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
+from token import Token
+from token_type import TokenType
+from run_mode import RunMode
+import op_code as op
+
+
+# A compiled function body - or the top-level script - with its code list and its constant pool.
+class Chunk:
+    def __init__(self, name: str, declaration: Function):
+        self.name = name
+        self.declaration = declaration
+        self.code = []
+        self.constants = []
+
+    def add_constant(self, value: Any) -> int:
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+
+# Everything the CLASS instruction needs in order to create a class at runtime.
+class ClassChunk:
+    def __init__(self, name: Token, super_class: Token, slot: int, methods: list, class_methods: list):
+        self.name = name
+        self.super_class = super_class
+        self.slot = slot
+        self.methods = methods
+        self.class_methods = class_methods
+
+
+class Compiler(Visitor):
+    binary_ops = {
+                  TokenType.PLUS : op.ADD,
+                  TokenType.MINUS : op.SUBTRACT,
+                  TokenType.STAR : op.MULTIPLY,
+                  TokenType.SLASH : op.DIVIDE,
+                  TokenType.LESS : op.LESS,
+                  TokenType.LESS_EQUAL : op.LESS_EQUAL,
+                  TokenType.GREATER : op.GREATER,
+                  TokenType.GREATER_EQUAL : op.GREATER_EQUAL,
+                  TokenType.EQUAL_EQUAL : op.EQUAL,
+                  TokenType.BANG_EQUAL : op.NOT_EQUAL
+                 }
+
+    def __init__(self, interpreter, mode: RunMode):
+        self.interpreter = interpreter
+        self.mode = mode
+        self.chunk = None
+        # The number of environments that exist at runtime on top of the globals, counted within the current function.
+        self.env_depth = 0
+        # A stack of the loops being compiled, each entry holds the loop's environment depth and its unpatched break jumps.
+        self.loops = []
+
+    def compile(self, statements: list[Stmt]) -> Chunk:
+        self.chunk = Chunk("script", None)
+        for statement in statements:
+            self.compile_by_mode(statement)
+        self.emit(op.CONSTANT, self.chunk.add_constant(None))
+        self.emit(op.RETURN)
+        return self.chunk
+
+    def compile_by_mode(self, statement: Stmt):
+        if self.mode == RunMode.REPL and type(statement) is Expression and type(statement.expr) is not Assign and type(statement.expr) is not Call:
+            self.compile_node(statement.expr)
+            self.emit(op.ECHO)
+        else:
+            self.compile_node(statement)
+
+    def compile_node(self, node: 'Stmt or Expr'):
+        node.accept(self)
+
+    def compile_function(self, name: str, function: Function) -> Chunk:
+        enclosing = (self.chunk, self.env_depth, self.loops)
+        self.chunk = Chunk(name, function)
+        self.env_depth = 1
+        self.loops = []
+        for statement in function.body:
+            self.compile_node(statement)
+        self.emit(op.CONSTANT, self.chunk.add_constant(None))
+        self.emit(op.RETURN)
+        chunk = self.chunk
+        self.chunk, self.env_depth, self.loops = enclosing
+        return chunk
+
+    def emit(self, *code: int):
+        self.chunk.code.extend(code)
+
+    def emit_jump(self, instruction: int) -> int:
+        self.emit(instruction, -1)
+        return len(self.chunk.code) - 1
+
+    def patch_jump(self, position: int):
+        self.chunk.code[position] = len(self.chunk.code)
+
+    def emit_define(self, name: Token):
+        if self.env_depth > 0:
+            self.emit(op.DEFINE_LOCAL)
+        else:
+            self.emit(op.DEFINE_GLOBAL, self.chunk.add_constant(name.lexeme))
+
+    def emit_get(self, expr: Expr, name: Token):
+        token = self.chunk.add_constant(name)
+        depth = expr.depth
+        if depth is None:
+            self.emit(op.GET_GLOBAL, token)
+        elif depth == 0:
+            self.emit(op.GET_LOCAL, expr.slot, token)
+        else:
+            self.emit(op.GET_UPPER, depth, expr.slot, token)
+
+    def visit_expression_stmt(self, stmt: Expression):
+        self.compile_node(stmt.expr)
+        self.emit(op.POP)
+
+    def visit_var_stmt(self, stmt: Var):
+        if stmt.initializer is not None:
+            self.compile_node(stmt.initializer)
+        else:
+            self.emit(op.CONSTANT, self.chunk.add_constant(self.interpreter.uninitialized))
+        self.emit_define(stmt.name)
+
+    # A block without a scope of its own is compiled inline, without entering an environment.
+    def visit_block_stmt(self, stmt: Block):
+        if not stmt.scoped:
+            for statement in stmt.statements:
+                self.compile_node(statement)
+            return None
+        self.emit(op.PUSH_ENV)
+        self.env_depth += 1
+        for statement in stmt.statements:
+            self.compile_node(statement)
+        self.env_depth -= 1
+        self.emit(op.POP_ENV, 1)
+
+    def visit_if_stmt(self, stmt: If):
+        self.compile_node(stmt.condition)
+        else_jump = self.emit_jump(op.JUMP_IF_FALSE)
+        self.compile_node(stmt.then_branch)
+        if stmt.else_branch is not None:
+            end_jump = self.emit_jump(op.JUMP)
+            self.patch_jump(else_jump)
+            self.compile_node(stmt.else_branch)
+            self.patch_jump(end_jump)
+        else:
+            self.patch_jump(else_jump)
+
+    # The loop is entered and left with instructions that let a function called in it break it, the loop is left the same way whether
+    # its condition fails or a break statement in it jumps to the end.
+    def visit_while_stmt(self, stmt: While):
+        loop = self.emit_jump(op.LOOP)
+        start = len(self.chunk.code)
+        self.compile_node(stmt.condition)
+        exit_jump = self.emit_jump(op.JUMP_IF_FALSE)
+        self.loops.append((self.env_depth, []))
+        self.compile_node(stmt.body)
+        _, breaks = self.loops.pop()
+        self.emit(op.JUMP, start)
+        self.patch_jump(exit_jump)
+        for break_jump in breaks:
+            self.patch_jump(break_jump)
+        self.emit(op.END_LOOP)
+        self.patch_jump(loop)
+
+    # A break statement in a function, outside of the function's loops, breaks the loop the function is called in.
+    def visit_break_stmt(self, stmt: Break):
+        if not self.loops:
+            self.emit(op.BREAK_OUT)
+            return
+        loop_depth, breaks = self.loops[-1]
+        if self.env_depth > loop_depth:
+            self.emit(op.POP_ENV, self.env_depth - loop_depth)
+        breaks.append(self.emit_jump(op.JUMP))
+
+    def visit_return_stmt(self, stmt: Return):
+        if stmt.value is not None:
+            self.compile_node(stmt.value)
+        else:
+            self.emit(op.CONSTANT, self.chunk.add_constant(None))
+        self.emit(op.RETURN)
+
+    def visit_fun_stmt(self, stmt: Fun):
+        chunk = self.compile_function(stmt.name.lexeme, stmt.function)
+        self.emit(op.CLOSURE, self.chunk.add_constant(chunk))
+        self.emit_define(stmt.name)
+
+    def visit_class_stmt(self, stmt: Class):
+        self.emit(op.CONSTANT, self.chunk.add_constant(None))
+        self.emit_define(stmt.name)
+        super_class = None
+        if stmt.super_class is not None:
+            super_class = stmt.super_class.name
+            self.compile_node(stmt.super_class)
+        methods = [(method.name.lexeme, self.compile_function(method.name.lexeme, method.function)) for method in stmt.methods]
+        class_methods = [(method.name.lexeme, self.compile_function(method.name.lexeme, method.function)) for method in stmt.class_methods]
+        slot = stmt.slot if self.env_depth > 0 else None
+        klass = ClassChunk(stmt.name, super_class, slot, methods, class_methods)
+        self.emit(op.CLASS, self.chunk.add_constant(klass))
+
+    def visit_assign_expr(self, expr: Assign):
+        self.compile_node(expr.value)
+        depth = expr.depth
+        if depth is None:
+            self.emit(op.SET_GLOBAL, self.chunk.add_constant(expr.name))
+        elif depth == 0:
+            self.emit(op.SET_LOCAL, expr.slot)
+        else:
+            self.emit(op.SET_UPPER, depth, expr.slot)
+
+    def visit_binary_expr(self, expr: Binary):
+        self.compile_node(expr.left)
+        if expr.operator.type_ == TokenType.COMMA:
+            self.emit(op.POP)
+            self.compile_node(expr.right)
+            return
+        self.compile_node(expr.right)
+        self.emit(Compiler.binary_ops[expr.operator.type_], self.chunk.add_constant(expr.operator))
+
+    # The tree-walker evaluates both branches before choosing one, and so does the compiled code.
+    def visit_conditional_expr(self, expr: Conditional):
+        self.compile_node(expr.condition)
+        self.compile_node(expr.then_branch)
+        self.compile_node(expr.else_branch)
+        self.emit(op.SELECT)
+
+    def visit_grouping_expr(self, expr: Grouping):
+        self.compile_node(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal):
+        self.emit(op.CONSTANT, self.chunk.add_constant(expr.value))
+
+    def visit_logical_expr(self, expr: Logical):
+        self.compile_node(expr.left)
+        if expr.operator.type_ == TokenType.OR:
+            end_jump = self.emit_jump(op.JUMP_IF_TRUE_OR_POP)
+        else:
+            end_jump = self.emit_jump(op.JUMP_IF_FALSE_OR_POP)
+        self.compile_node(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_unary_expr(self, expr: Unary):
+        self.compile_node(expr.right)
+        if expr.operator.type_ == TokenType.MINUS:
+            self.emit(op.NEGATE)
+        else:
+            self.emit(op.NOT)
+
+    def visit_variable_expr(self, expr: Variable):
+        self.emit_get(expr, expr.name)
+
+    def visit_function_expr(self, expr: Function):
+        chunk = self.compile_function(None, expr)
+        self.emit(op.CLOSURE, self.chunk.add_constant(chunk))
+
+    def visit_call_expr(self, expr: Call):
+        self.compile_node(expr.callee)
+        paren = self.chunk.add_constant(expr.paren)
+        # The callee has to be checked before the arguments are evaluated, unless evaluating them can't be observed.
+        if not all(type(arg) is Literal for arg in expr.args):
+            self.emit(op.CHECK_CALLABLE, paren)
+        for arg in expr.args:
+            self.compile_node(arg)
+        self.emit(op.CALL, len(expr.args), paren)
+
+    def visit_get_expr(self, expr: Get):
+        self.compile_node(expr.obj)
+        self.emit(op.GET_PROPERTY, self.chunk.add_constant(expr.name))
+
+    def visit_set_expr(self, expr: Set):
+        name = self.chunk.add_constant(expr.name)
+        self.compile_node(expr.obj)
+        self.emit(op.CHECK_INSTANCE, name)
+        self.compile_node(expr.value)
+        self.emit(op.SET_PROPERTY, name)
+
+    def visit_this_expr(self, expr: This):
+        self.emit_get(expr, expr.keyword)
+
+    def visit_super_expr(self, expr: Super):
+        self.emit(op.GET_SUPER, expr.depth, expr.slot, self.chunk.add_constant(expr.method))
@@ -0,0 +1,22 @@
+'''
+The module houses the definition of a counted loop - a while loop which the optimizer recognized as counting a local variable
+by a constant step while comparing it to a bound, the shape a for loop like the following is desugared into:
+    for (var i = a; i < n; i = i + 1) body
+The tree-walker runs a counted loop natively: it keeps the counter in a Python variable, compares it to the bound directly and
+increments it without evaluating the increment expression, writing it back to its slot of the frame for the body to read.
+A bound which is invariant - the body can't change it - is evaluated once, before the loop.
+'''
+from token import Token
+
+class CountedLoop:
+    __slots__ = ("index", "operator", "bound", "invariant", "step", "statements")
+
+    def __init__(self, index: int, operator: Token, bound: 'Expr', invariant: bool, step: 'int or float', statements: list['Stmt']):
+        # The counter's slot of the frame, and the comparison of the counter to the bound.
+        self.index = index
+        self.operator = operator
+        self.bound = bound
+        self.invariant = invariant
+        self.step = step
+        # The statements of the loop's body without the increment.
+        self.statements = statements
@@ -8,6 +8,8 @@ from error import LoxRunTimeError
 from var_state import VarState
 
 class Environment:
+    __slots__ = ("enclosing", "vars")
+
     def __init__(self, enclosing=None):
         self.enclosing = enclosing
         self.vars = []
@@ -28,3 +30,9 @@ class Environment:
         return env
 
 
+# A cell holds a local variable that inner functions capture, the frame and the closures of the functions share the cell.
+class Cell:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
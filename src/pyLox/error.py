@@ -25,8 +25,3 @@ class BreakException(Exception):
     def __init__(self):
         pass
 
-# An exception that is raised when a return statement is read to escape from the function body and return the value.
-class ReturnException(Exception):
-    def __init__(self, value):
-        self.value = value
-
@@ -1,6 +1,12 @@
 '''
 The module houses the definitions of all of the expressions that can be encountered in a Lox source file.
 We use the visitor design pattern to evaluate expressions so each expression will have the accept method.
+The expressions which refer to a variable hold its address, the depth of its environment and its slot, which the resolver fills in.
+A depth of None marks a global variable.
+The tree-walker's address is the access and the index - a slot of the frame, or a captured cell - and an access of None marks a global variable.
+The expressions have no __dict__, their fields - the ones the resolver, the optimizer and the tree-walker fill in as well - are declared
+in slots, which makes a parsed program a lot smaller.
+Every class of expression has a kind - a small integer, which the statements' kinds continue - that indexes the visitors' dispatch tables.
 '''
 from abc import ABC, abstractmethod
 from typing import Any
@@ -9,26 +15,43 @@ from function_type import FunctionType
 from var_state import VarState
 
 class Expr:
-    pass
+    __slots__ = ()
 
 class Assign(Expr):
+    __slots__ = ("name", "value", "depth", "slot", "access", "index")
+    kind = 0
+
     def __init__(self, name: Token, value: Expr):
         self.name = name
         self.value = value
+        self.depth = None
+        self.slot = None
+        self.access = None
+        self.index = None
 
     def accept(self, visitor):
         return visitor.visit_assign_expr(self)
 
 class Binary(Expr):
+    __slots__ = ("left", "operator", "right", "specialization", "specializations")
+    kind = 1
+
     def __init__(self, left: Expr, operator: Token,  right: Expr):
         self.left = left
         self.operator = operator
         self.right = right
+        # The types of the operands the tree-walker specialized the expression on, with the operation for them, and the number of times
+        # the expression specialized.
+        self.specialization = None
+        self.specializations = 0
 
     def accept(self, visitor):
         return visitor.visit_binary_expr(self)
 
 class Conditional(Expr):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    kind = 2
+
     def __init__(self, condition: Expr, then_branch: Expr, else_branch: Expr):
         self.condition = condition
         self.then_branch = then_branch
@@ -38,6 +61,9 @@ class Conditional(Expr):
         return visitor.visit_conditional_expr(self)
 
 class Grouping(Expr):
+    __slots__ = ("expression",)
+    kind = 3
+
     def __init__(self, expression: Expr):
         self.expression = expression
 
@@ -45,6 +71,9 @@ class Grouping(Expr):
         return visitor.visit_grouping_expr(self)
 
 class Literal(Expr):
+    __slots__ = ("value",)
+    kind = 4
+
     def __init__(self, value: Any):
         self.value = value
 
@@ -52,6 +81,9 @@ class Literal(Expr):
         return visitor.visit_literal_expr(self)
 
 class Logical(Expr):
+    __slots__ = ("left", "operator", "right")
+    kind = 5
+
     def __init__(self, left: Expr, operator: Token, right: Expr):
         self.left = left
         self.operator = operator
@@ -61,6 +93,9 @@ class Logical(Expr):
         return visitor.visit_logical_expr(self)
 
 class Unary(Expr):
+    __slots__ = ("operator", "right")
+    kind = 6
+
     def __init__(self, operator: Token, right: Expr):
         self.operator = operator
         self.right = right
@@ -69,59 +104,122 @@ class Unary(Expr):
         return visitor.visit_unary_expr(self)
 
 class Variable(Expr):
+    __slots__ = ("name", "state", "depth", "slot", "access", "index")
+    kind = 7
+
     def __init__(self, name: Token, state=VarState.READ):
         self.name = name
         self.state = state
+        self.depth = None
+        self.slot = None
+        self.access = None
+        self.index = None
 
     def accept(self, visitor):
         return visitor.visit_variable_expr(self)
 
 class Function(Expr):
+    __slots__ = ("params", "body", "type_", "frame_size", "upvalues", "this_index", "cells", "encloses", "frames", "inline")
+    kind = 8
+
     def __init__(self, params: list[Token], body: list[Any], type_: FunctionType):
         self.params = params
         self.body = body
         self.type_ = type_
+        # The layout of the function's frame and the cells it captures, which the resolver fills in.
+        self.frame_size = 0
+        self.upvalues = []
+        self.this_index = None
+        self.cells = []
+        self.encloses = False
+        # The frames of the calls of the function which returned, which the next calls reuse.
+        self.frames = []
+        # Whether the optimizer found the body to be a single statement returning a small expression, which is evaluated without a call.
+        self.inline = False
 
     def accept(self, visitor):
         return visitor.visit_function_expr(self)
 
 class Call(Expr):
+    __slots__ = ("callee", "paren", "args", "target", "tail")
+    kind = 9
+
     def __init__(self, callee: Expr, paren: Token, args: list[Expr]):
         self.callee = callee
         self.paren = paren
         self.args = args
+        # The global function whose body the optimizer inlined at the call.
+        self.target = None
+        # Whether the call is the value a function returns, which the resolver marks.
+        self.tail = False
 
     def accept(self, visitor):
         return visitor.visit_call_expr(self)
 
 class Get(Expr):
+    __slots__ = ("obj", "name", "methods", "shape", "index")
+    kind = 10
+
     def __init__(self, obj: Expr, name: Token):
         self.obj = obj
         self.name = name
+        # The tree-walker's inline caches - the method the property resolved to for each class of the objects seen at the node,
+        # and the shape of the last object whose field the node read, with the index of the field.
+        self.methods = {}
+        self.shape = None
+        self.index = None
     
     def accept(self, visitor):
         return visitor.visit_get_expr(self)
 
 class Set(Expr):
+    __slots__ = ("obj", "name", "value", "shape", "index", "transition")
+    kind = 11
+
     def __init__(self, obj: Expr, name: Token, value: Expr):
         self.obj = obj
         self.name = name
         self.value = value
+        # The tree-walker's inline cache - the shape of the last object whose field the node assigned, the index of the field,
+        # and the shape the object moved to when it didn't have the field yet.
+        self.shape = None
+        self.index = None
+        self.transition = None
     
     def accept(self, visitor):
         return visitor.visit_set_expr(self)
 
 class This(Expr):
+    __slots__ = ("keyword", "depth", "slot", "access", "index")
+    kind = 12
+
     def __init__(self, keyword: Token):
         self.keyword = keyword
+        self.depth = None
+        self.slot = None
+        self.access = None
+        self.index = None
     
     def accept(self, visitor):
         return visitor.visit_this_expr(self)
 
 class Super(Expr):
+    __slots__ = ("keyword", "method", "depth", "slot", "access", "index", "this_index")
+    kind = 13
+
     def __init__(self, keyword: Token, method: Token):
         self.keyword = keyword
         self.method = method
+        self.depth = None
+        self.slot = None
+        self.access = None
+        self.index = None
+        # The index of the captured cell holding the object the method is bound to.
+        self.this_index = None
 
     def accept(self, visitor):
-        return visitor.visit_super_expr(self)
\ No newline at end of file
+        return visitor.visit_super_expr(self)
+
+
+# The names of the visit functions of the expressions, in the order of their kinds.
+expr_visits = ["visit_assign_expr", "visit_binary_expr", "visit_conditional_expr", "visit_grouping_expr", "visit_literal_expr", "visit_logical_expr", "visit_unary_expr", "visit_variable_expr", "visit_function_expr", "visit_call_expr", "visit_get_expr", "visit_set_expr", "visit_this_expr", "visit_super_expr"]
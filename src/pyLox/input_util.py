@@ -1,14 +1,12 @@
 '''
 The module houses 3 utility functions that are used in the Lox Native Library input function - read.
 '''
+from numeric import exact
+
 def _typify(string: str):
     if string == 'nil':
         return None
-    value = convert_to_number(string)
-    if type(value) is float:
-        if value.is_integer():
-            return int(value)
-    return value
+    return convert_to_number(string)
 
 def is_digit(char: chr ) -> bool:
         return char >= '0' and char <= '9'
@@ -22,5 +20,5 @@ def convert_to_number(string: str):
         while index < len(string) and is_digit(string[index]):
             index += 1
     if index == len(string) and string != '':
-        return float(string)
+        return float(string) if '.' in string else exact(int(string))
     return string
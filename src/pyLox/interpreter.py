@@ -1,6 +1,10 @@
 '''
 The module serves as our interpreter pass, whose job is to evaluate and execute statements, and find and report runtime errors.
 The evalutation and execution are achieved with the visitor design pattern, and therefore it will implement the visitor class.
+The locals of a running function live in a flat frame - a list with a slot for every local of the function - and the locals which inner
+functions capture live in cells, that the frame and the closures of the inner functions share. Blocks don't create anything at runtime.
+Executing a statement returns how it completed, like the closure compiler's closures: None when it completed normally, BREAK when a
+break statement was executed, or a one item tuple holding the returned value when a return statement was executed.
 '''
 import sys
 import operator
@@ -12,15 +16,23 @@ from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Cl
 from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
 from token_type import TokenType
 from token import Token
-from error import LoxRunTimeError, DivisionByZeroError, ReturnException, BreakException
+from error import LoxRunTimeError, DivisionByZeroError, BreakException
 from error_handler import ErrorHandler
-from environment import Environment
+from environment import Cell
+from access import Access
 from run_mode import RunMode
 from Lox_callable import LoxCallable
-from Lox_function import LoxFunction
+from Lox_function import LoxFunction, TailCall
 from var_state import VarState
 from Lox_class import LoxClass
 from Lox_instance import LoxInstance
+from counted_loop import CountedLoop
+from specialization import specialize, MAX_SPECIALIZATIONS
+from numeric import divide, negate, format_number, add, subtract, multiply
+
+BREAK = object()
+# The number of classes an inline cache remembers a method for, a node which sees objects of more classes looks the others up every time.
+MAX_CACHED_CLASSES = 4
 
 class Interpreter(Visitor):
 
@@ -39,16 +51,23 @@ class Interpreter(Visitor):
 
     def __init__(self, error_handler: ErrorHandler):
         self.error_handler = error_handler
+        self.visits = self.dispatch_table()
         self.globals = {}
-        self.environment = None
+        # The frame of the running function and the cells its closure captured, the top-level code has a frame but no closure.
+        self.frame = None
+        self.closure = None
+        # The size of the top-level code's frame, which the resolver sets.
+        self.frame_size = 0
         self.globals['clock'] =  Clock()
         self.globals['read'] = Read()
         self.globals['array'] = Array()
         self.globals['print'] = Print()
-        self.locals = {}
-        self.slots = {}
+        # The front end's function which parses and resolves a lazily parsed function body, set by the driver in lazy mode.
+        self.body_loader = None
 
     def interpret(self, statements: list[Stmt], mode: RunMode):
+        self.frame = [None] * self.frame_size
+        self.closure = None
         try:
             for statement in statements:
                 self.execute_by_mode(statement, mode)
@@ -63,17 +82,29 @@ class Interpreter(Visitor):
             self.execute(statement)
 
     def execute(self, statement: Stmt):
-        statement.accept(self)
+        return self.visits[statement.kind](statement)
     
+    # The function parses and resolves a lazily parsed function body before its first call.
+    def load_body(self, function: Function):
+        function.body = self.body_loader(function)
+
+    # The resolver annotates a variable's node with the address of the variable - the distance to its environment and its slot.
+    # A node that isn't resolved keeps a depth of None, which marks a global variable.
     def resolve(self, expr, depth: int, slot: int):
-        self.locals[expr] = depth
-        self.slots[expr] = slot
+        expr.depth = depth
+        expr.slot = slot
     
+    # A captured variable's cell is created before its initializer runs, so the closures created by the initializer share it.
     def visit_var_stmt(self, stmt: Var):
+        if stmt.access is Access.CELL:
+            cell = self.frame[stmt.index] = Cell(Interpreter.uninitialized)
+            if stmt.initializer is not None:
+                cell.value = self.evaluate(stmt.initializer)
+            return None
         value = Interpreter.uninitialized
         if stmt.initializer is not None:
             value = self.evaluate(stmt.initializer)
-        self.define(stmt.name.lexeme, value)
+        self.define(stmt, value)
 
     def visit_expression_stmt(self, stmt: Expression):
         expr = self.evaluate(stmt.expr)
@@ -82,74 +113,121 @@ class Interpreter(Visitor):
         value = self.evaluate(stmt.expr)
         print(self.stringify(value))
     '''
+    # The locals of a block have slots in the function's frame, so a block only executes its statements.
     def visit_block_stmt(self, stmt: Block):
-        self.execute_block(stmt.statements, Environment(self.environment))
+        for statement in stmt.statements:
+            completion = self.execute(statement)
+            if completion is not None:
+                return completion
+        return None
 
     def visit_if_stmt(self, stmt: If):
         if self.is_truth(self.evaluate(stmt.condition)):
-            self.execute(stmt.then_branch)
+            return self.execute(stmt.then_branch)
         elif stmt.else_branch is not None:
-            self.execute(stmt.else_branch)
+            return self.execute(stmt.else_branch)
+        return None
 
+    # A returned call to a function completes the body with the tail call, which the calling function makes in its place.
     def visit_return_stmt(self, stmt: Return):
-        value = None
-        if stmt.value is not None:
-            value = self.evaluate(stmt.value)
-        raise ReturnException(value)
+        value = stmt.value
+        if value is None:
+            return (None,)
+        if type(value) is Call and value.tail:
+            result = self.visit_call_expr(value, True)
+            return result if type(result) is TailCall else (result,)
+        return (self.evaluate(value),)
 
+    # The methods capture the superclass's cell, and the class's own cell when they refer to the class.
     def visit_class_stmt(self, stmt: Class):
-        self.define(stmt.name.lexeme, None)
+        self.define(stmt, None)
         super_class = None
         if stmt.super_class is not None:
             super_class = self.evaluate(stmt.super_class)
             if not isinstance(super_class, LoxClass):
                 raise LoxRunTimeError(stmt.super_class.name,"Superclass must be a class.")
-            self.environment = Environment(self.environment)
-            self.environment.define(super_class)
+            self.frame[stmt.super_index] = Cell(super_class)
         class_methods = {}
         for class_method in stmt.class_methods:
-            function = LoxFunction(class_method, class_method.function, self.environment, False)
+            function = LoxFunction(class_method, class_method.function, self.capture(class_method.function), False)
             class_methods[class_method.name.lexeme] = function
-        metaclass = LoxClass(None, f'{stmt.name.lexeme}metaclass', None, class_methods)
+        metaclass = LoxClass(None, None, f'{stmt.name.lexeme}metaclass', class_methods)
         methods = {}
         for method in stmt.methods:
-            function = LoxFunction(method, method.function, self.environment, method.name.lexeme == 'init')
+            function = LoxFunction(method, method.function, self.capture(method.function), method.name.lexeme == 'init')
             methods[method.name.lexeme] = function
         klass = LoxClass(metaclass, super_class, stmt.name.lexeme, methods)
-        if super_class is not None:
-            self.environment = self.environment.enclosing
-        if self.environment:
-            self.environment.assign_at(0, self.slots[stmt], klass)
+        if stmt.access is Access.CELL:
+            self.frame[stmt.index].value = klass
         else:
-            self.globals[stmt.name.lexeme] = klass
+            self.define(stmt, klass)
 
     def visit_this_expr(self, expr: This):
         return self.look_up_variable(expr.keyword, expr)
     
+    # A method which refers to super captures the superclass's cell and the cell of the object it's bound to.
     def visit_super_expr(self, expr: Super):
-        super_class = self.environment.get_at(self.locals[expr], self.slots[expr])
-        if self.environment:
-            obj = self.environment.get_at(self.locals[expr] - 1, 0)
-        else:
-            obj = self.globals['this']
+        super_class = self.closure[expr.index].value
+        obj = self.closure[expr.this_index].value
         method = super_class.find_method(expr.method.lexeme)
         if method is None:
             raise LoxRunTimeError(expr.method,f"Undefined propery {expr.method.lexeme}.")
         return method.bind(obj)
 
+    # A counted loop whose counter isn't a number when it starts runs as a while loop, which reports the error.
+    # A function called in the loop which executes a break statement - a break in a function nested in a loop parses - breaks the loop
+    # by raising BreakException.
     def visit_while_stmt(self, loop: While):
+        counted = loop.counted
+        if counted is not None:
+            value = self.frame[counted.index]
+            if type(value) is float or type(value) is int:
+                return self.run_counted_loop(counted, value)
         try:
             while self.is_truth(self.evaluate(loop.condition)):
-                self.execute(loop.body)
+                completion = self.execute(loop.body)
+                if completion is not None:
+                    return None if completion is BREAK else completion
         except BreakException:
             pass
+        return None
     
+    # The function runs a counted loop, the counter and the bound are compared and the counter is incremented exactly like the loop's
+    # condition and increment would.
+    def run_counted_loop(self, loop: CountedLoop, value: 'int or float') -> Any:
+        frame = self.frame
+        index = loop.index
+        compare = Interpreter.op_dic[loop.operator.type_]
+        limit = self.evaluate(loop.bound)
+        self.check_comparison_operands(loop.operator, value, limit)
+        statements = loop.statements
+        step = loop.step
+        try:
+            while compare(value, limit):
+                for statement in statements:
+                    completion = self.execute(statement)
+                    if completion is not None:
+                        return None if completion is BREAK else completion
+                value = add(value, step)
+                frame[index] = value
+                if not loop.invariant:
+                    limit = self.evaluate(loop.bound)
+                    self.check_comparison_operands(loop.operator, value, limit)
+        except BreakException:
+            pass
+        return None
+
     def visit_break_stmt(self, break_stmt: Break):
-        raise BreakException()
+        return BREAK
     
+    # A recursive local function captures its own variable, so the variable's cell is created before the function.
     def visit_fun_stmt(self, stmt: Fun):
         f_name = stmt.name.lexeme
-        self.define(f_name, LoxFunction(f_name, stmt.function, self.environment))
+        if stmt.access is Access.CELL:
+            cell = self.frame[stmt.index] = Cell(None)
+            cell.value = LoxFunction(f_name, stmt.function, self.capture(stmt.function))
+            return None
+        self.define(stmt, LoxFunction(f_name, stmt.function, self.capture(stmt.function)))
         return None
 
     def visit_variable_expr(self, expr: Variable) -> Any:
@@ -157,13 +235,17 @@ class Interpreter(Visitor):
 
     def visit_assign_expr(self, expr: Assign) -> Any:
         value = self.evaluate(expr.value)
-        if expr in self.locals:
-            self.environment.assign_at(self.locals[expr], self.slots[expr], value)
+        access = expr.access
+        if access is Access.LOCAL:
+            self.frame[expr.index] = value
+        elif access is Access.UPVALUE:
+            self.closure[expr.index].value = value
+        elif access is Access.CELL:
+            self.frame[expr.index].value = value
+        elif expr.name.lexeme in self.globals:
+            self.globals[expr.name.lexeme] = value
         else:
-            if expr.name.lexeme in self.globals:
-                self.globals[expr.name.lexeme] = value
-            else:
-                raise LoxRunTimeError(expr.name, f"Undefined variable {expr.name.lexeme}.")
+            raise LoxRunTimeError(expr.name, f"Undefined variable {expr.name.lexeme}.")
         return value
 
     def visit_literal_expr(self, expr: Literal) -> str:
@@ -175,40 +257,48 @@ class Interpreter(Visitor):
     def visit_unary_expr(self, expr: Unary) -> str:
         right = self.evaluate(expr.right)
         if expr.operator.type_ == TokenType.MINUS:
-            value =  -float(right)
-            value = int(value) if value.is_integer() else value
-            return value
+            return negate(right)
         if expr.operator.type_ == TokenType.BANG:
             return not self.is_truth(right)
 
+    # A specialized expression whose operands have the types it specialized on computes its operation right away, and otherwise it's
+    # computed by the generic path, and specializes on the types of its operands again.
     def visit_binary_expr(self, expr: Binary) -> str:
         left = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
+        specialization = expr.specialization
+        if specialization is not None and type(left) is specialization[0] and type(right) is specialization[1]:
+            value = specialization[2](left, right)
+            if value is not None:
+                return value
+        value = self.compute_binary(expr, left, right)
+        if expr.specializations < MAX_SPECIALIZATIONS:
+            expr.specializations += 1
+            operation = specialize(expr.operator.type_, type(left), type(right))
+            expr.specialization = None if operation is None else (type(left), type(right), operation)
+        elif specialization is not None:
+            expr.specialization = None
+        return value
+
+    # The generic path of a binary expression, which checks the operands and reports the errors.
+    def compute_binary(self, expr: Binary, left: Any, right: Any) -> Any:
         if expr.operator.type_ == TokenType.MINUS:
             self.check_number_operand(expr.operator, left, right)
-            value = float(left) - float(right)
-            value = int(value) if value.is_integer() else value
-            return value            
+            return subtract(left, right)
         elif expr.operator.type_ == TokenType.STAR:
             self.check_number_operand(expr.operator, left, right)
-            value = float(left) * float(right)
-            value = int(value) if value.is_integer() else value
-            return value
+            return multiply(left, right)
         elif expr.operator.type_ == TokenType.SLASH:
             if self.legal_divisor(expr.operator, right):
                 self.check_number_operand(expr.operator, left, right)
-                value = float(left) / float(right)
-                value = int(value) if value.is_integer() else value
-                return value
+                return divide(left, right)
         elif expr.operator.type_ == TokenType.PLUS:
             '''
             Notice that because of Pythons dynamic typing, we didnt have to check for types,
             but we did so for learning purposes.
             '''
             if (type(left) is float or type(left) is int) and (type(right) is float or type(right) is int):
-                value = float(left) + float(right)
-                value = int(value) if value.is_integer() else value
-                return value
+                return add(left, right)
             elif type(left) is str or type(right) is str:
                 value = self.stringify(left)+self.stringify(right)
                 return value
@@ -240,46 +330,168 @@ class Interpreter(Visitor):
         return self.evaluate(expr.right)
 
     def visit_function_expr(self, expr: Function) -> str:
-        return LoxFunction(None, expr, self.environment)
+        return LoxFunction(None, expr, self.capture(expr))
+
+    # The function collects the cells a new function captures, from the current frame or from the current function's closure.
+    # A method's 'this' is only known once the method is bound, until then its cell is None.
+    def capture(self, function: Function) -> list[Cell]:
+        cells = []
+        for is_local, index in function.upvalues:
+            if index is None:
+                cells.append(None)
+            elif is_local:
+                cells.append(self.frame[index])
+            else:
+                cells.append(self.closure[index])
+        return cells
 
-    def visit_call_expr(self, expr: Call) -> str:
-        callee = self.evaluate(expr.callee)
+    # A method called on an object, or on 'this' through super, is invoked on it directly, without creating a method bound to
+    # the object first.
+    # A call in tail position to a function other than an initializer isn't made, it returns the tail call to make instead.
+    def visit_call_expr(self, expr: Call, tail=False) -> str:
+        callee = expr.callee
+        if type(callee) is Get:
+            obj = self.evaluate(callee.obj)
+            if (type(obj) is LoxInstance or type(obj) is LoxClass) and callee.name.lexeme not in obj.shape.indices:
+                method = self.find_method(callee, obj.klass)
+                if method is not None and not method.is_getter():
+                    arguments = [self.evaluate(argument) for argument in expr.args]
+                    if len(arguments) != method.arity():
+                        raise LoxRunTimeError(expr.paren,f"Expected {method.arity()} arguments but got {len(arguments)}.")
+                    if tail and not method.is_ini:
+                        return TailCall(method, method.bound_closure(obj), arguments)
+                    return method.invoke(self, obj, arguments)
+            callee = self.get_property(callee, obj)
+        elif type(callee) is Super:
+            obj = self.closure[callee.this_index].value
+            method = self.closure[callee.index].value.find_method(callee.method.lexeme)
+            if method is not None:
+                arguments = [self.evaluate(argument) for argument in expr.args]
+                if len(arguments) != method.arity():
+                    raise LoxRunTimeError(expr.paren,f"Expected {method.arity()} arguments but got {len(arguments)}.")
+                if tail and not method.is_ini:
+                    return TailCall(method, method.bound_closure(obj), arguments)
+                return method.invoke(self, obj, arguments)
+            callee = self.visit_super_expr(callee)
+        else:
+            callee = self.evaluate(callee)
+        # A call that the optimizer inlined skips the checks and the call, as long as the callee is still the inlined function.
+        if type(callee) is LoxFunction and callee.declaration is expr.target:
+            return self.call_inline(callee, [self.evaluate(argument) for argument in expr.args])
         if not isinstance(callee, LoxCallable):
             raise LoxRunTimeError(expr.paren,"Can only call functions and classes." )
         arguments = [self.evaluate(argument) for argument in expr.args]
         if len(arguments) != callee.arity():
             raise LoxRunTimeError(expr.paren,f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+        if tail and type(callee) is LoxFunction and not callee.is_ini:
+            return TailCall(callee, callee.closure, arguments)
         return callee.call(self, arguments)
 
     def visit_get_expr(self, expr: Get) -> str:
-        obj = self.evaluate(expr.obj)
+        return self.get_property(expr, self.evaluate(expr.obj))
+
+    # A field of an object of the shape the node last saw is read at the index the node remembers, and a method is looked up
+    # through the node's inline cache.
+    def get_property(self, expr: Get, obj: Any) -> Any:
+        if type(obj) is LoxInstance or type(obj) is LoxClass:
+            shape = obj.shape
+            if shape is expr.shape:
+                return obj.values[expr.index]
+            index = shape.indices.get(expr.name.lexeme)
+            if index is not None:
+                expr.shape = shape
+                expr.index = index
+                return obj.values[index]
+            method = self.find_method(expr, obj.klass)
+            if method is None:
+                raise LoxRunTimeError(expr.name,f"Undefined property {expr.name.lexeme}.")
+            if method.is_getter():
+                if method.declaration.inline:
+                    return self.call_inline(method.bind(obj), [])
+                return method.invoke(self, obj, [])
+            return method.bind(obj)
         if isinstance(obj, LoxInstance):
             result = obj.get(expr.name)
             if isinstance(result, LoxFunction) and result.is_getter():
-                result = result.call(self, [])
+                result = self.call_inline(result, []) if result.declaration.inline else result.call(self, [])
         else:
             raise LoxRunTimeError(expr.name,"Only instances have properties.")
         return result
 
+    # The method a property resolves to in a class is looked up once and remembered in the node's inline cache,
+    # classes never change their methods so the cached method stays the right one.
+    def find_method(self, expr: Get, klass: LoxClass) -> LoxFunction:
+        methods = expr.methods
+        try:
+            return methods[klass]
+        except KeyError:
+            method = klass.find_method(expr.name.lexeme)
+            if len(methods) < MAX_CACHED_CLASSES:
+                methods[klass] = method
+            return method
+
     def visit_set_expr(self, expr: Set) -> str:
         obj = self.evaluate(expr.obj)
         if not isinstance(obj, LoxInstance):
             raise LoxRunTimeError(expr.name,"Only instances have properties.")
         value = self.evaluate(expr.value)
-        obj.set(expr.name, value)
+        if type(obj) is LoxInstance or type(obj) is LoxClass:
+            self.set_field(expr, obj, value)
+        else:
+            obj.set(expr.name, value)
         return value
 
-    def execute_block(self, statements: list[Stmt], environment: Environment):
-        previous_envi = self.environment
+    # An object of the shape the node last saw gets the field at the index the node remembers, moving to the same next shape
+    # when the field is new to it.
+    def set_field(self, expr: Set, obj: LoxInstance, value: Any):
+        shape = obj.shape
+        if shape is not expr.shape:
+            index = shape.indices.get(expr.name.lexeme)
+            expr.shape = shape
+            if index is None:
+                expr.index = len(obj.values)
+                expr.transition = shape.add(expr.name.lexeme)
+            else:
+                expr.index = index
+                expr.transition = None
+        if expr.transition is None:
+            obj.values[expr.index] = value
+        else:
+            obj.values.append(value)
+            obj.shape = expr.transition
+
+    # The function evaluates the expression that an inlined function returns, in a frame holding the arguments.
+    # The function doesn't capture its parameters, so the arguments are its whole frame.
+    def call_inline(self, function: LoxFunction, arguments: list[Any]) -> Any:
+        previous_frame = self.frame
+        previous_closure = self.closure
+        try:
+            self.frame = arguments
+            self.closure = function.closure
+            return self.evaluate(function.declaration.body[0].value)
+        finally:
+            self.frame = previous_frame
+            self.closure = previous_closure
+
+    # The function executes the body of a function in the function's frame, with the cells the function captured,
+    # and returns how the body completed.
+    def execute_body(self, statements: list[Stmt], frame: list, closure: list[Cell]) -> Any:
+        previous_frame = self.frame
+        previous_closure = self.closure
         try:
-            self.environment = environment
+            self.frame = frame
+            self.closure = closure
             for statement in statements:
-                self.execute(statement)
+                completion = self.execute(statement)
+                if completion is not None:
+                    return completion
+            return None
         finally:
-            self.environment = previous_envi
+            self.frame = previous_frame
+            self.closure = previous_closure
     
     def evaluate(self, expr: Expr) -> str:
-        return expr.accept(self)
+        return self.visits[expr.kind](expr)
 
     def check_comparison_operands(self, operator: Token, *args):
         all_string = True
@@ -299,14 +511,21 @@ class Interpreter(Visitor):
             return expression
         return True
 
+    # The variable's address is read off its node, a local is a single index into the frame or the closure,
+    # as this is the hottest path of the interpreter.
     def look_up_variable(self, name: Token, expr: Expr) -> Any:
-        if expr in self.locals:
-            value = self.environment.get_at(self.locals[expr], self.slots[expr])
+        access = expr.access
+        if access is Access.LOCAL:
+            value = self.frame[expr.index]
+        elif access is Access.UPVALUE:
+            value = self.closure[expr.index].value
+        elif access is Access.CELL:
+            value = self.frame[expr.index].value
         elif name.lexeme in self.globals:
             value = self.globals[name.lexeme]
         else:
             raise LoxRunTimeError(name, f"Undefined variable {name.lexeme}.")
-        if value == Interpreter.uninitialized:
+        if value is Interpreter.uninitialized:
             raise LoxRunTimeError(name, "Variable must be initialized before use.")
         return value
     
@@ -319,10 +538,7 @@ class Interpreter(Visitor):
         if value is None:
             return "nil"
         if type(value) is float:
-            text = str(value)
-            if text.endswith(".0") or value.is_integer():
-                text = text[0:len(text)-2]
-            return text
+            return format_number(value)
         return str(value)
 
     def legal_divisor(self, operator: Token, divisor: float) -> bool:
@@ -331,8 +547,12 @@ class Interpreter(Visitor):
             return False
         return True
 
-    def define(self, name: str, value: Any):
-        if self.environment is not None:
-            self.environment.define(value)
+    # The function defines the variable declared by a statement, in its slot of the frame, in a new cell, or in the globals.
+    def define(self, stmt: Stmt, value: Any):
+        access = stmt.access
+        if access is Access.LOCAL:
+            self.frame[stmt.index] = value
+        elif access is Access.CELL:
+            self.frame[stmt.index] = Cell(value)
         else:
-            self.globals[name] = value    
\ No newline at end of file
+            self.globals[stmt.name.lexeme] = value    
\ No newline at end of file
@@ -0,0 +1,34 @@
+'''
+The module houses the definition of a lazily parsed function body.
+In lazy mode the parser only matches the braces of a function body to find where it ends, and keeps its tokens.
+The body is parsed and resolved the first time its function is called, so functions which are never called cost almost nothing.
+'''
+from token import Token
+from token_type import TokenType
+from class_type import ClassType
+
+class LazyBody:
+    __slots__ = ("brace", "tokens", "loop_depth", "statements", "scopes", "scope_frames", "current_class", "frame")
+
+    def __init__(self, brace: Token, tokens: list[Token], loop_depth: int):
+        # The tokens start after the body's opening brace, and end with its closing brace and an EOF token.
+        self.brace = brace
+        self.tokens = tokens
+        # The number of loops around the function, which the parser of its body starts in.
+        self.loop_depth = loop_depth
+        # With the strict flag the body is parsed eagerly to report syntax errors, and only its resolution is deferred.
+        self.statements = None
+        # The resolver's scopes and class where the function is declared, which its body is resolved in.
+        self.scopes = None
+        self.scope_frames = None
+        self.current_class = ClassType.NONE
+        # The frame of the function, whose captured cells are known before the body is resolved.
+        self.frame = None
+
+    # The names the body refers to, the resolver marks them as read in the enclosing scopes and captures them before the body is resolved.
+    # A super expression binds the superclass's method to 'this', so it refers to 'this' as well.
+    def names(self) -> set[str]:
+        names = {token.lexeme for token in self.tokens if token.type_ in (TokenType.IDENTIFIER, TokenType.THIS, TokenType.SUPER)}
+        if 'super' in names:
+            names.add('this')
+        return names
@@ -10,6 +10,7 @@ from token import Token
 from error import LoxRunTimeError
 import array_methods as arr
 from input_util import _typify
+from numeric import format_number
 
 '''
 This function will show the time passed since the running of interpreter started and until the function has been called. Can be called by clock()
@@ -75,9 +76,7 @@ class LoxArray(LoxInstance):
     def __str__(self):
         string = "["
         for member in self.elements:
-            string += f"{member}"
-            if type(member) is float and member.is_integer():
-                string = string[:-2]
+            string += format_number(member) if type(member) is float else f"{member}"
             string += ", "
         string = string[:-2]
         string += "]"
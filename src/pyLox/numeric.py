@@ -0,0 +1,62 @@
+'''
+The module houses the numeric operations that Python's operators don't compute the way Lox does, shared by all of the engines.
+Lox numbers are Python integers and floats: integer literals and arithmetic on integers produce integers, and a float is only produced
+by a float operand, or by dividing integers that don't divide evenly.
+Lox numbers used to be doubles, which hold every integer up to 2**53 exactly. An integer result beyond that becomes the float the
+double arithmetic produced - the exact result, rounded - so the results and their printing are unchanged, and integers never grow
+past the range of floats: 9007199254740993 is 9007199254740992.0, and a huge integer times 1.5 is an infinity rather than an error.
+'''
+from typing import Any
+
+# Every integer up to MAX_EXACT, in magnitude, is exactly representable as a float.
+MAX_EXACT = 2 ** 53
+
+
+# The function returns an integer which is exactly representable as it is, and the float nearest to it otherwise.
+def exact(value: int) -> Any:
+    if -MAX_EXACT <= value <= MAX_EXACT:
+        return value
+    return float(value)
+
+
+# The operators on numbers, whose integer results are kept exact.
+def add(left: Any, right: Any) -> Any:
+    result = left + right
+    if type(result) is int and not -MAX_EXACT <= result <= MAX_EXACT:
+        return float(result)
+    return result
+
+
+def subtract(left: Any, right: Any) -> Any:
+    result = left - right
+    if type(result) is int and not -MAX_EXACT <= result <= MAX_EXACT:
+        return float(result)
+    return result
+
+
+def multiply(left: Any, right: Any) -> Any:
+    result = left * right
+    if type(result) is int and not -MAX_EXACT <= result <= MAX_EXACT:
+        return float(result)
+    return result
+
+
+# Dividing integers that divide evenly produces an integer, like the other operators on integers.
+def divide(left: Any, right: Any) -> Any:
+    if type(left) is int and type(right) is int and left % right == 0:
+        return left // right
+    return left / right
+
+
+# Negating a value which isn't a number fails the way converting it to a float does.
+def negate(value: Any) -> Any:
+    if type(value) is int or type(value) is float:
+        return -value
+    return -float(value)
+
+
+# An integral float is printed without its fraction, like the integer it equals.
+def format_number(value: float) -> str:
+    if value.is_integer():
+        return str(int(value))
+    return str(value)
@@ -0,0 +1,58 @@
+'''
+The module houses the instruction set of the bytecode virtual machine.
+Every instruction is an opcode followed by its operands. Both are stored as plain integers in a chunk's code list, so the dispatch
+loop in vm.py compares small integers instead of enum members. Operands that refer to tokens, names or values are indices into the
+chunk's constant pool, and jump operands are absolute positions in the code list.
+'''
+
+# Loads and stores.
+CONSTANT = 0           # index          - push constants[index].
+POP = 1                #                - discard the value on top of the stack.
+GET_LOCAL = 2          # slot, token    - push a variable from the current environment.
+SET_LOCAL = 3          # slot           - assign the top of the stack to a variable in the current environment.
+GET_UPPER = 4          # depth, slot, token - push a variable from an enclosing environment.
+SET_UPPER = 5          # depth, slot    - assign the top of the stack to a variable in an enclosing environment.
+GET_GLOBAL = 6         # token          - push a global variable.
+SET_GLOBAL = 7         # token          - assign the top of the stack to an existing global variable.
+DEFINE_LOCAL = 8       #                - pop a value and define it in the current environment.
+DEFINE_GLOBAL = 9      # name           - pop a value and define it as a global variable.
+
+# Arithmetic and comparison, the token operand is used for runtime errors.
+ADD = 10               # token
+SUBTRACT = 11          # token
+MULTIPLY = 12          # token
+DIVIDE = 13            # token
+LESS = 14              # token
+LESS_EQUAL = 15        # token
+GREATER = 16           # token
+GREATER_EQUAL = 17     # token
+EQUAL = 18             # token
+NOT_EQUAL = 19         # token
+NEGATE = 20            #
+NOT = 21               #
+SELECT = 22            #                - pop else, then & condition values and push the chosen one (ternary conditional).
+
+# Control flow.
+JUMP = 23              # target
+JUMP_IF_FALSE = 24     # target         - pop the condition and jump if it is falsey.
+JUMP_IF_FALSE_OR_POP = 25  # target     - jump if the top of the stack is falsey, otherwise pop it ('and').
+JUMP_IF_TRUE_OR_POP = 26   # target     - jump if the top of the stack is truthy, otherwise pop it ('or').
+PUSH_ENV = 27          #                - enter a new block environment.
+POP_ENV = 28           # count          - leave count block environments.
+
+# Functions, classes and instances.
+CLOSURE = 29           # index          - push a new function whose prototype is constants[index].
+CHECK_CALLABLE = 30    # token          - raise an error if the callee on top of the stack isn't callable.
+CALL = 31              # count, token
+RETURN = 32            #
+GET_PROPERTY = 33      # token
+CHECK_INSTANCE = 34    # token          - raise an error if the top of the stack isn't an instance.
+SET_PROPERTY = 35      # token
+GET_SUPER = 36         # depth, slot, token
+CLASS = 37             # index          - create the class described by constants[index].
+ECHO = 38              #                - pop a value and display it (REPL expression statements).
+
+# Breaking a loop from a function called in it - a break in a function declared in a loop parses.
+LOOP = 39              # target         - enter a loop, which a function called in it that breaks continues after, at target.
+END_LOOP = 40          #                - leave the loop.
+BREAK_OUT = 41         #                - break the innermost running loop, in the function that called this one or further up.
@@ -0,0 +1,356 @@
+'''
+The module serves as the optimizer, an optional pass between the resolver and the interpreter, enabled with the -O option.
+The optimizer rewrites the resolved statements and expressions by implementing the visitor pattern, every visit returns the node that
+replaces the visited node, or None for a statement that is removed.
+1. Constant folding - an operator whose operands are literals is evaluated once by the interpreter's own visit methods, so the folded
+   value is exactly the value the operator produces at runtime. An operator that raises a runtime error is kept, so the error is still
+   reported when the program runs.
+2. Dead branches - an if statement with a literal condition is replaced by the branch that runs, a while loop whose condition is a falsy
+   literal is removed, and so are the operands of 'and', 'or' and ',' that are never used.
+3. Dead code - the statements after a return or a break statement are never reached, and are removed.
+4. Groupings are replaced by the expression they group.
+5. Counted loops - a while loop that counts a local variable by a constant step up or down to a bound, which is what a for loop
+   usually desugars into, is marked with its counter, step and bound, so the tree-walker runs it natively. A bound that the loop can't
+   change is hoisted out of the loop - the loop's condition is evaluated on entry anyway, so evaluating it once raises the same errors.
+6. Inlining - a function whose body returns a small expression, and which doesn't capture its parameters, is marked so the tree-walker
+   evaluates the expression in place of calling the function - getters are evaluated like that. The calls to such a function declared
+   at the top level, which is declared once, never assigned, and doesn't call itself, are marked with the function, and the tree-walker
+   skips the call machinery for them as long as the callee is still that function.
+The optimizer counts the nodes it removed, which the driver reports.
+'''
+from visitor import Visitor
+from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
+from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
+from token_type import TokenType
+from error import LoxRunTimeError
+from interpreter import Interpreter
+from access import Access
+from counted_loop import CountedLoop
+
+# The largest returned expression, counted in nodes, of a function that is inlined.
+INLINE_SIZE = 24
+# The attributes which refer to nodes elsewhere in the tree, rather than to the nodes below.
+REFERENCES = ("target",)
+COMPARISONS = (TokenType.LESS, TokenType.LESS_EQUAL, TokenType.GREATER, TokenType.GREATER_EQUAL)
+# The expressions which have no side effects, apart from the runtime errors they may raise.
+PURE = (Grouping, Unary, Binary, Logical, Conditional)
+
+
+# The function yields the statements and expressions right below a node, the nodes declare all of their fields in slots.
+def children(node: 'Stmt or Expr'):
+    for name in type(node).__slots__:
+        if name in REFERENCES:
+            continue
+        value = getattr(node, name)
+        if type(value) is list:
+            for child in value:
+                if isinstance(child, (Stmt, Expr)):
+                    yield child
+        elif isinstance(value, (Stmt, Expr)):
+            yield value
+
+
+# The function yields the statements and expressions in a list and all of the nodes below them, inside function bodies as well.
+def walk(nodes: list['Stmt or Expr']):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(children(node))
+
+
+# The function counts the nodes of a statement or an expression together with the nodes below it.
+def size(node: 'Stmt or Expr or list') -> int:
+    if type(node) is list:
+        return sum(size(child) for child in node)
+    if not isinstance(node, (Stmt, Expr)):
+        return 0
+    return 1 + sum(size(child) for child in children(node))
+
+
+# The function returns the slots of the frame which the statements or expressions assign. A nested function can't assign them,
+# as the locals it refers to live in cells, so nested functions aren't searched.
+def assigned(nodes: list['Stmt or Expr']) -> set[int]:
+    slots = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if type(node) is Function:
+            continue
+        if type(node) is Assign and node.access is Access.LOCAL:
+            slots.add(node.index)
+        stack.extend(children(node))
+    return slots
+
+
+# An invariant expression is made of literals and of locals of the frame that aren't assigned, with no calls or property accesses.
+def is_invariant(expr: Expr, assigned_slots: set[int]) -> bool:
+    if type(expr) is Literal:
+        return True
+    if type(expr) is Variable:
+        return expr.access is Access.LOCAL and expr.index not in assigned_slots
+    if type(expr) in PURE:
+        return all(is_invariant(child, assigned_slots) for child in children(expr))
+    return False
+
+
+class Optimizer(Visitor):
+    def __init__(self, interpreter: Interpreter):
+        # The interpreter evaluates the folded operators.
+        self.interpreter = interpreter
+        self.removed = 0
+        self.inlined = 0
+        # The global functions whose calls are inlined, by name.
+        self.inlinable = {}
+
+    # The function optimizes a program, and then inlines the calls to its small global functions.
+    def optimize(self, statements: list[Stmt]) -> list[Stmt]:
+        statements = self.optimize_list(statements)
+        self.find_inlinable(statements)
+        self.inline_calls(statements)
+        return statements
+
+    # A lazily parsed body is optimized once it's loaded, and the calls in it to the program's small global functions are inlined.
+    def optimize_function(self, statements: list[Stmt]) -> list[Stmt]:
+        statements = self.optimize_list(statements)
+        self.inline_calls(statements)
+        return statements
+
+    # A function's calls are inlined if it's declared once at the top level, never assigned, and doesn't refer to itself.
+    # The interpreter still checks at every inlined call that the callee is the inlined function, so redefining it is safe.
+    def find_inlinable(self, statements: list[Stmt]):
+        declared = {}
+        for statement in statements:
+            if type(statement) in (Var, Fun, Class) and statement.access is None:
+                declared[statement.name.lexeme] = declared.get(statement.name.lexeme, 0) + 1
+                self.inlinable.pop(statement.name.lexeme, None)
+        reassigned = {node.name.lexeme for node in walk(statements) if type(node) is Assign and node.access is None}
+        for statement in statements:
+            if type(statement) is not Fun or statement.access is not None or not statement.function.inline:
+                continue
+            name = statement.name.lexeme
+            recursive = any(type(node) is Variable and node.access is None and node.name.lexeme == name for node in walk(statement.function.body))
+            if declared[name] == 1 and name not in reassigned and not recursive:
+                self.inlinable[name] = statement.function
+
+    def inline_calls(self, statements: list[Stmt]):
+        for node in walk(statements):
+            if type(node) is Call and type(node.callee) is Variable and node.callee.access is None:
+                function = self.inlinable.get(node.callee.name.lexeme)
+                if function is not None and len(node.args) == len(function.params):
+                    node.target = function
+                    self.inlined += 1
+
+    # The function optimizes a list of statements, and drops the statements that were removed and the ones after a return or a break.
+    def optimize_list(self, statements: list[Stmt]) -> list[Stmt]:
+        optimized = []
+        for i in range(len(statements)):
+            statement = statements[i].accept(self)
+            if statement is None:
+                continue
+            optimized.append(statement)
+            if type(statement) is Return or type(statement) is Break:
+                self.removed += size(statements[i+1:])
+                break
+        return optimized
+
+    # A statement that must stay a statement - the branch of an if statement or the body of a loop - is replaced by an empty block.
+    def optimize_body(self, stmt: Stmt) -> Stmt:
+        optimized = stmt.accept(self)
+        if optimized is None:
+            optimized = Block([])
+            optimized.scoped = False
+        return optimized
+
+    def optimize_expr(self, expr: Expr) -> Expr:
+        return expr.accept(self)
+
+    # The function replaces a node, and counts the nodes that the replacement removed.
+    def replace(self, node: 'Stmt or Expr', replacement: 'Stmt or Expr') -> 'Stmt or Expr':
+        self.removed += size(node) - size(replacement)
+        return replacement
+
+    # The function evaluates an operator whose operands are literals, an operator that raises a runtime error is left as is.
+    def fold(self, expr: Expr) -> Expr:
+        try:
+            value = expr.accept(self.interpreter)
+        except LoxRunTimeError:
+            return expr
+        return self.replace(expr, Literal(value))
+
+    def visit_expression_stmt(self, stmt: Expression):
+        # The REPL prints the value of a grouped assignment or call, but not of a bare one, so the statement's own grouping is kept for them.
+        if type(stmt.expr) is Grouping:
+            grouping = stmt.expr
+            grouping.expression = self.optimize_expr(grouping.expression)
+            if type(grouping.expression) is not Assign and type(grouping.expression) is not Call:
+                stmt.expr = self.replace(grouping, grouping.expression)
+            return stmt
+        stmt.expr = self.optimize_expr(stmt.expr)
+        return stmt
+
+    def visit_var_stmt(self, stmt: Var):
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimize_expr(stmt.initializer)
+        return stmt
+
+    def visit_block_stmt(self, stmt: Block):
+        stmt.statements = self.optimize_list(stmt.statements)
+        return stmt
+
+    def visit_if_stmt(self, stmt: If):
+        stmt.condition = self.optimize_expr(stmt.condition)
+        stmt.then_branch = self.optimize_body(stmt.then_branch)
+        if stmt.else_branch is not None:
+            stmt.else_branch = self.optimize_body(stmt.else_branch)
+        if type(stmt.condition) is not Literal:
+            return stmt
+        branch = stmt.then_branch if self.interpreter.is_truth(stmt.condition.value) else stmt.else_branch
+        if branch is None:
+            self.removed += size(stmt)
+            return None
+        return self.replace(stmt, branch)
+
+    def visit_while_stmt(self, stmt: While):
+        stmt.condition = self.optimize_expr(stmt.condition)
+        if type(stmt.condition) is Literal and not self.interpreter.is_truth(stmt.condition.value):
+            self.removed += size(stmt)
+            return None
+        stmt.body = self.optimize_body(stmt.body)
+        stmt.counted = self.counted_loop(stmt)
+        return stmt
+
+    # The function recognizes a counted loop: its condition compares a local of the frame to a bound, and its body is a block that ends
+    # by adding a number to the local. Neither the rest of the body nor the bound may assign the counter.
+    def counted_loop(self, loop: While) -> CountedLoop:
+        condition, body = loop.condition, loop.body
+        if type(condition) is not Binary or condition.operator.type_ not in COMPARISONS or type(body) is not Block or not body.statements:
+            return None
+        counter = condition.left
+        increment = body.statements[-1]
+        if type(counter) is not Variable or counter.access is not Access.LOCAL:
+            return None
+        if type(increment) is not Expression or type(increment.expr) is not Assign:
+            return None
+        assign = increment.expr
+        value = assign.value
+        if assign.access is not Access.LOCAL or assign.index != counter.index or type(value) is not Binary:
+            return None
+        if value.operator.type_ != TokenType.PLUS and value.operator.type_ != TokenType.MINUS:
+            return None
+        if type(value.left) is not Variable or value.left.access is not Access.LOCAL or value.left.index != counter.index:
+            return None
+        if type(value.right) is not Literal or (type(value.right.value) is not float and type(value.right.value) is not int):
+            return None
+        statements = body.statements[:-1]
+        assigned_slots = assigned(statements + [condition.right])
+        if counter.index in assigned_slots:
+            return None
+        assigned_slots.add(counter.index)
+        step = value.right.value if value.operator.type_ == TokenType.PLUS else -value.right.value
+        return CountedLoop(counter.index, condition.operator, condition.right, is_invariant(condition.right, assigned_slots), step, statements)
+
+    def visit_break_stmt(self, stmt: Break):
+        return stmt
+
+    def visit_fun_stmt(self, stmt: Fun):
+        stmt.function = self.optimize_expr(stmt.function)
+        return stmt
+
+    def visit_return_stmt(self, stmt: Return):
+        if stmt.value is not None:
+            stmt.value = self.optimize_expr(stmt.value)
+        return stmt
+
+    def visit_class_stmt(self, stmt: Class):
+        stmt.methods = [method.accept(self) for method in stmt.methods]
+        stmt.class_methods = [class_method.accept(self) for class_method in stmt.class_methods]
+        return stmt
+
+    # A lazily parsed body isn't parsed yet, it's optimized when it's loaded.
+    def visit_function_expr(self, expr: Function):
+        if type(expr.body) is list:
+            expr.body = self.optimize_list(expr.body)
+            body = expr.body
+            expr.inline = (len(body) == 1 and type(body[0]) is Return and body[0].value is not None and not expr.cells
+                           and size(body[0].value) <= INLINE_SIZE)
+        return expr
+
+    def visit_binary_expr(self, expr: Binary):
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if type(expr.left) is Literal:
+            if type(expr.right) is Literal:
+                return self.fold(expr)
+            # The left operand of a comma is evaluated only for its effects, and a literal has none.
+            if expr.operator.type_ == TokenType.COMMA:
+                return self.replace(expr, expr.right)
+        return expr
+
+    def visit_unary_expr(self, expr: Unary):
+        expr.right = self.optimize_expr(expr.right)
+        if type(expr.right) is not Literal:
+            return expr
+        # Negating a string or nil fails with a Python error rather than a Lox runtime error, so only numbers are folded.
+        if expr.operator.type_ == TokenType.MINUS and type(expr.right.value) is not float and type(expr.right.value) is not int:
+            return expr
+        return self.fold(expr)
+
+    # A logical operator whose left operand is a literal is either its left operand, or its right operand.
+    def visit_logical_expr(self, expr: Logical):
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if type(expr.left) is not Literal:
+            return expr
+        if self.interpreter.is_truth(expr.left.value) == (expr.operator.type_ == TokenType.OR):
+            return self.replace(expr, expr.left)
+        return self.replace(expr, expr.right)
+
+    # Both branches of a conditional expression are evaluated, so it's only folded when the branch that isn't chosen is a literal.
+    def visit_conditional_expr(self, expr: Conditional):
+        expr.condition = self.optimize_expr(expr.condition)
+        expr.then_branch = self.optimize_expr(expr.then_branch)
+        expr.else_branch = self.optimize_expr(expr.else_branch)
+        if type(expr.condition) is not Literal:
+            return expr
+        if self.interpreter.is_truth(expr.condition.value):
+            chosen, other = expr.then_branch, expr.else_branch
+        else:
+            chosen, other = expr.else_branch, expr.then_branch
+        if type(other) is not Literal:
+            return expr
+        return self.replace(expr, chosen)
+
+    def visit_grouping_expr(self, expr: Grouping):
+        expr.expression = self.optimize_expr(expr.expression)
+        return self.replace(expr, expr.expression)
+
+    def visit_literal_expr(self, expr: Literal):
+        return expr
+
+    def visit_assign_expr(self, expr: Assign):
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_variable_expr(self, expr: Variable):
+        return expr
+
+    def visit_call_expr(self, expr: Call):
+        expr.callee = self.optimize_expr(expr.callee)
+        expr.args = [self.optimize_expr(argument) for argument in expr.args]
+        return expr
+
+    def visit_get_expr(self, expr: Get):
+        expr.obj = self.optimize_expr(expr.obj)
+        return expr
+
+    def visit_set_expr(self, expr: Set):
+        expr.obj = self.optimize_expr(expr.obj)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_this_expr(self, expr: This):
+        return expr
+
+    def visit_super_expr(self, expr: Super):
+        return expr
@@ -0,0 +1,4 @@
+from enum import IntEnum
+
+# The binding powers of the expressions, from the loosest to the tightest.
+Precedence = IntEnum("Precedence", "COMMA ASSIGNMENT CONDITIONAL OR AND EQUALITY COMPARISON TERM FACTOR UNARY CALL")
@@ -10,26 +10,76 @@ The interpreter has 4 stages:
 3. The resolver performs semantic analysis on the statements and expressions, such as resolving variable - tracking down to which declaration
    a variable refers to.
 4. The interpreter executes the statements and expressions.
+   The statements can be executed by one of three engines, chosen with the --engine option:
+   tree - the default, a tree-walker which evaluates the statements and expressions directly.
+   vm - a bytecode compiler and a stack based virtual machine which executes the compiled bytecode.
+   closure - a compiler which turns every statement and expression into a Python closure once, and then calls the closures.
+   python - a transpiler which translates the statements into Python source code and runs it as a compiled Python code object.
+            When running a source file, the code object is cached on disk, so running the same source again skips all 4 stages.
+When running a source file, the resolved program - the statements, annotated by the resolver - is cached on disk in __loxcache__,
+so running the same source again skips the first 3 stages.
+With the --stream option, a source file is read and scanned in chunks, and the parser consumes the tokens as they are scanned,
+so the front end doesn't hold the whole source or all of its tokens in memory. Errors of the scanner and the parser may then interleave.
+With the --lazy option, the tree-walker parses and resolves a function body only when the function is first called, and reports
+the errors found in the body then. Adding the --strict option still parses every body up front to report syntax errors early.
+With the -O option, the optimizer folds constants, removes dead branches and unreachable code, and inlines small functions in the
+resolved statements before they're executed, and reports how many nodes it removed and how many calls it inlined.
 '''
+import os
+import gc
 import sys
+import pickle
 import argparse
 from run_mode import RunMode as mode
 from error_handler import ErrorHandler
+from error import LoxRunTimeError
 from scanner import Scanner
 from Lox_parser import Parser
 from interpreter import Interpreter
+from vm import VM
+from closure_compiler import ClosureInterpreter
+from transpiler import PythonInterpreter
+from compile_cache import CompileCache
 from resolver import Resolver
+from optimizer import Optimizer
+from expr import Function
+
+# The execution engines that can run the resolved statements, the tree-walker is the default.
+engines = {
+           "tree" : Interpreter,
+           "vm" : VM,
+           "closure" : ClosureInterpreter,
+           "python" : PythonInterpreter
+          }
 
 
 class Lox:
-    def __init__(self):
+    def __init__(self, engine="tree", stream=False, lazy=False, strict=False, optimize=False):
         self.error_handler = ErrorHandler()
-        self.interpreter = Interpreter(self.error_handler)
+        self.interpreter = engines[engine](self.error_handler)
+        # The compile cache is only used when running a source file.
+        self.cache = None
+        self.stream = stream
+        # The compiling engines translate every function ahead of time, so only the tree-walker parses function bodies lazily.
+        self.lazy = lazy and engine == "tree"
+        self.strict = strict
+        if self.lazy:
+            self.interpreter.body_loader = self.load_body
+        # Lazily parsed programs are cached apart from eagerly parsed ones, and strictly parsed ones apart from both.
+        self.program_kind = ("strict-ast" if strict else "lazy-ast") if self.lazy else "ast"
+        # Optimized programs and code objects are cached apart from the ones that weren't optimized.
+        self.optimize = optimize
+        self.optimizer = Optimizer(self.interpreter) if optimize else None
+        self.code_kind = "python"
+        if optimize:
+            self.program_kind += "-optimized"
+            self.code_kind += "-optimized"
     
-    # Runs the interpreter with a source file.
+    # Runs the interpreter with a source file, a streamed source file is passed on as a file.
     def run_file(self, path: str):
+        self.cache = CompileCache(os.path.dirname(os.path.abspath(path)))
         with open(path, "r") as f:
-            self.run("".join(f.readlines()), mode.FILE)
+            self.run(f if self.stream else "".join(f.readlines()), mode.FILE)
             if self.error_handler.had_error or self.error_handler.had_runtime_error:
                 sys.exit()
 
@@ -44,27 +94,123 @@ class Lox:
             print ("\nKeyboard interrupt.")
 
     # This functions performs the 4 passes: scanning, parsing, resolving & binding, and interpreting.
-    def run(self, source: str, mode):
+    def run(self, source: 'str or TextIO', mode):
+        key = self.cache.key(source) if self.cache is not None else None
+        if isinstance(self.interpreter, PythonInterpreter):
+            self.run_transpiled(source, key, mode)
+            return
+        statements = self.analyze(source, key)
+        if statements is None:
+            return
+        self.interpreter.interpret(statements, mode)
+
+    # This function performs the first 3 passes, and returns the resolved statements or None if an error was found.
+    # A program that was resolved before is loaded from the compile cache instead.
+    def analyze(self, source: 'str or TextIO', key: str):
+        if key is not None:
+            statements = self.load_program(key)
+            if statements is not None:
+                return statements
         scanner = Scanner(self.error_handler, source)
-        tokens = scanner.scan_tokens()
-        parser = Parser(tokens, self.error_handler)
+        tokens = scanner.scan_tokens() if isinstance(source, str) else scanner.stream_tokens()
+        parser = Parser(tokens, self.error_handler, self.lazy, self.strict)
         statements = parser.parse()
         if self.error_handler.had_error == True:
-            return 
+            return None
         resolver = Resolver(self.interpreter, self.error_handler)
-        resolver.resolve_list(statements)
+        resolver.resolve_program(statements)
         if self.error_handler.had_error == True:
+            return None
+        if self.optimize:
+            statements = self.optimize_program(statements)
+        if key is not None:
+            self.store_program(key, statements)
+        return statements
+
+    # The optimizer runs after the resolver, so the nodes it keeps hold their addresses. The report is printed when running a source file.
+    def optimize_program(self, statements: list) -> list:
+        statements = self.optimizer.optimize(statements)
+        if self.cache is not None:
+            print(f"The optimizer removed {self.optimizer.removed} nodes and inlined {self.optimizer.inlined} calls.", file=sys.stderr)
+        return statements
+
+    # The resolver stores the addresses of the variables on the statements' nodes, so they're pickled together with them,
+    # and the size of the top-level code's frame is pickled alongside.
+    def store_program(self, key: str, statements):
+        try:
+            data = pickle.dumps((statements, self.interpreter.frame_size), pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError):
             return
-        self.interpreter.interpret(statements, mode)
+        self.cache.store(key, self.program_kind, data)
+
+    def load_program(self, key: str):
+        data = self.cache.load(key, self.program_kind)
+        if data is None:
+            return None
+        # Unpickling creates a lot of objects which never form garbage, so the cyclic garbage collector would only slow it down.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            statements, self.interpreter.frame_size = pickle.loads(data)
+        # A corrupted entry is ignored like a missing one, the program is simply resolved again.
+        except Exception:
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        # The program lives as long as the interpreter, freezing it keeps the collector from scanning it over and over again.
+        gc.freeze()
+        return statements
+
+    # A lazily parsed function body is parsed and resolved the first time its function is called, in the scopes it's declared in.
+    # Errors found in the body are reported like the front end's errors, and stop the program with a runtime error.
+    def load_body(self, function: Function) -> list:
+        body = function.body
+        statements = body.statements
+        if statements is None:
+            statements = Parser(body.tokens, self.error_handler, True).lazy_body(body)
+        if not self.error_handler.had_error:
+            Resolver(self.interpreter, self.error_handler).resolve_deferred_function(function, statements)
+        if self.error_handler.had_error:
+            raise LoxRunTimeError(body.brace, "Function body has errors.")
+        if self.optimize:
+            statements = self.optimizer.optimize_function(statements)
+        return statements
+
+    # The transpiler's code objects are cached, so running a cached source file skips the scanner, parser, resolver and transpiler.
+    def run_transpiled(self, source: 'str or TextIO', key: str, mode):
+        code = None
+        if key is not None:
+            data = self.cache.load(key, self.code_kind)
+            if data is not None:
+                code = self.interpreter.load_code(data)
+        if code is None:
+            statements = self.analyze(source, key)
+            if statements is None:
+                return
+            code = self.interpreter.compile(statements, mode)
+            if key is not None:
+                self.cache.store(key, self.code_kind, self.interpreter.dump_code(code))
+        self.interpreter.run_code(code)
 
 
 if __name__ == "__main__":
-    Lox = Lox()
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument("script", nargs='?', type=str , default=None,  
                             help="The path to the source file to be interpreted."+
                             " Path needs to be encapsulated with quotation marks.")
+    arg_parser.add_argument("--engine", choices=engines.keys(), default="tree",
+                            help="The engine that executes the program: the tree-walker, the bytecode virtual machine, the closure compiler or the Python transpiler.")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="Scan the source file in chunks and parse its tokens as they are scanned, instead of reading it as a whole.")
+    arg_parser.add_argument("--lazy", action="store_true",
+                            help="Parse and resolve a function body only when the function is first called. Only the tree engine parses lazily.")
+    arg_parser.add_argument("--strict", action="store_true",
+                            help="With --lazy, still parse every function body up front to report syntax errors before running.")
+    arg_parser.add_argument("-O", dest="optimize", action="store_true",
+                            help="Fold constants and remove dead branches and unreachable code before running, and report the number of removed nodes.")
     args = arg_parser.parse_args()
+    Lox = Lox(args.engine, args.stream, args.lazy, args.strict, args.optimize)
     if args.script is not None:
         Lox.run_file(args.script)
     else:
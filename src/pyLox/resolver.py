@@ -1,6 +1,9 @@
 '''
 The module serves as our resolver, whose job is to walk over our tree and perform semantic analysis on the code.
 The resolver resolves our variables - tracking down which declaration it refers to, by implementing the visitor pattern.
+Every variable gets two addresses: the distance to its environment and its slot, which the engines with environments use,
+and its place in the flat frames of the tree-walker - a slot of the current function's frame, or one of the cells the function captured.
+The resolver finds which locals are captured by inner functions, those live in cells that their closures share.
 '''
 from visitor import Visitor
 #from stmt import Stmt, Expression,Print, Var, Block, If, While, Break, Fun, Return, Class
@@ -13,36 +16,70 @@ from token_type import TokenType
 from function_type import FunctionType
 from var_state import VarState
 from class_type import ClassType
+from lazy_body import LazyBody
+from access import Access
+
+# The layout of the frame of a function, or of the top-level code, which the resolver builds while resolving the function.
+class Frame:
+    def __init__(self, enclosing: 'Frame'):
+        self.enclosing = enclosing
+        self.size = 0
+        # Where each captured variable comes from when the function is created:
+        # (True, slot) - a slot of the enclosing frame, or (False, index) - a cell that the enclosing function captured.
+        # A method's 'this' comes from (True, None), it is filled in when the method is bound.
+        self.upvalues = []
+        self.upvalue_indices = {}
+        self.this_index = None
+        # The slots of the locals that inner functions capture, and the nodes which refer to each local slot.
+        self.captured = set()
+        self.references = {}
+        # Whether functions are created in the frame, which may capture the environment a call of the function runs in.
+        self.encloses = False
+        if enclosing is not None:
+            enclosing.encloses = True
+
 
 class Resolver(Visitor):
     def __init__(self, interpreter: Interpreter, error_handler: ErrorHandler):
         self.interpreter = interpreter
+        self.visits = self.dispatch_table()
         self.scopes = []
+        # The frame of the code that is being resolved, and the frame each scope belongs to.
+        self.frame = Frame(None)
+        self.scope_frames = []
         self.error_handler = error_handler
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
+        # The number of loops around the code being resolved, counted within the current function.
+        self.loop_depth = 0
     
+    # Only the statements directly in a block declare variables in its scope, a block which has none of them doesn't get a scope,
+    # so the body of a loop or an if statement doesn't cost an environment and isn't counted in the depth of the variables it refers to.
     def visit_block_stmt(self, stmt: Block):
+        stmt.scoped = any(type(statement) in (Var, Fun, Class) for statement in stmt.statements)
+        if not stmt.scoped:
+            self.resolve_list(stmt.statements)
+            return None
         self.begin_scope()
         self.resolve_list(stmt.statements)
         self.end_scope()
         return None
 
     def visit_var_stmt(self, stmt: Var):
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         if stmt.initializer is not None and stmt.initializer != Interpreter.uninitialized:
             self.resolve(stmt.initializer)
         self.define(stmt.name)
         
     def visit_fun_stmt(self, stmt: Fun):
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name, True)
         self.resolve(stmt.function)
 
     def visit_class_stmt(self, stmt: Class):
         enclosing_class = self.current_class
         self.current_class = ClassType.CLASS
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name, True)
         if stmt.super_class is not None:
             self.current_class = ClassType.SUBCLASS
@@ -51,16 +88,14 @@ class Resolver(Visitor):
             self.resolve(stmt.super_class)
             self.resolve_local(stmt.super_class, stmt.super_class.name, True)
             self.begin_scope()
-            self.scopes[-1]['super'] = (Variable(stmt.super_class.name, VarState.READ), len(self.scopes[-1]))
+            stmt.super_index = self.allocate()
+            self.scopes[-1]['super'] = (Variable(stmt.super_class.name, VarState.READ), len(self.scopes[-1]), stmt.super_index)
         self.begin_scope()
         self.resolve_local(stmt, stmt.name, True)
         this_token = Token(TokenType.THIS, 'this', None, stmt.name.line)
         self.declare(this_token)
         self.define(this_token, True)
         for method in stmt.methods:
-            method.type_ = FunctionType.METHOD
-            if method.name.lexeme == 'init':
-                method.type_ = FunctionType.INITIALIZER
             self.resolve(method)
         self.end_scope()
         for class_method in stmt.class_methods:
@@ -93,10 +128,16 @@ class Resolver(Visitor):
             self.error_handler.error_on_token(stmt.keyword,"Can't return a value from an initializer.") 
         if stmt.value is not None:
             self.resolve(stmt.value)
+            # A returned call is in tail position, the function's frame isn't needed once the call is made.
+            # A call returned inside a loop isn't, a break that the called function executes breaks that loop.
+            if type(stmt.value) is Call and self.loop_depth == 0:
+                stmt.value.tail = True
 
     def visit_while_stmt(self, stmt: While):
         self.resolve(stmt.condition)
+        self.loop_depth += 1
         self.resolve(stmt.body)
+        self.loop_depth -= 1
     
     def visit_variable_expr(self, expr: Variable):
         if self.scopes and expr.name.lexeme in self.scopes[-1]:
@@ -134,6 +175,10 @@ class Resolver(Visitor):
         elif self.current_class != ClassType.SUBCLASS:
              self.error_handler.error_on_token(expr.keyword, "Can't use 'super' in a class with no superclass.")           
         self.resolve_local(expr, expr.keyword, True)
+        # The method is bound to the instance 'this' refers to.
+        depth = self.find('this')
+        if depth is not None:
+            expr.this_index = self.capture(self.frame, self.scope_frames[depth], self.scopes[depth]['this'])
 
     
     def visit_binary_expr(self, expr: Binary):
@@ -156,51 +201,156 @@ class Resolver(Visitor):
         self.resolve(expr.expression)
 
     def visit_function_expr(self, expr: Function):
+        if type(expr.body) is LazyBody:
+            self.defer_function(expr)
+            return None
+        self.resolve_function(expr, expr.body, Frame(self.frame))
+
+    # A function gets a frame of its own, whose first slots are the parameters.
+    def resolve_function(self, expr: Function, body: list[Stmt], frame: Frame):
         enclosing_function = self.current_function
+        enclosing_frame = self.frame
+        enclosing_loop_depth = self.loop_depth
         self.current_function = expr.type_
+        self.frame = frame
+        self.loop_depth = 0
         self.begin_scope()
         for param in expr.params:
             self.declare(param)
             self.define(param)
-        self.resolve_list(expr.body)
+        self.resolve_list(body)
         self.current_function = enclosing_function
+        self.loop_depth = enclosing_loop_depth
+        expr.cells = [slot for slot in range(len(expr.params)) if slot in frame.captured]
         self.end_scope()
+        expr.frame_size = frame.size
+        expr.encloses = frame.encloses
+        expr.upvalues = frame.upvalues
+        expr.this_index = frame.this_index
+        self.frame = enclosing_frame
+
+    # A lazily parsed body is resolved the first time its function is called, in a copy of the scopes it's declared in,
+    # so variables which are declared after the function stay hidden from it.
+    # The enclosing variables that the body may refer to are marked as read, so they aren't reported as unused,
+    # and are captured right away, as the function's closure is created before its body is resolved.
+    def defer_function(self, expr: Function):
+        body = expr.body
+        body.scopes = [dict(scope) for scope in self.scopes]
+        body.scope_frames = list(self.scope_frames)
+        body.current_class = self.current_class
+        body.frame = Frame(self.frame)
+        for name in body.names():
+            depth = self.find(name)
+            if depth is not None:
+                self.scopes[depth][name][0].state = VarState.READ
+                self.capture(body.frame, self.scope_frames[depth], self.scopes[depth][name])
+        expr.upvalues = body.frame.upvalues
+        expr.this_index = body.frame.this_index
+
+    # The function resolves a lazily parsed function once its body was parsed.
+    def resolve_deferred_function(self, expr: Function, statements: list[Stmt]):
+        body = expr.body
+        self.scopes = body.scopes
+        self.scope_frames = body.scope_frames
+        self.frame = body.frame.enclosing
+        self.current_class = body.current_class
+        self.resolve_function(expr, statements, body.frame)
 
     def visit_literal_expr(self, expr: Literal):
         pass
 
+    # The function resolves a program, the frame of the top-level code holds the locals of its blocks.
+    def resolve_program(self, statements: list[Stmt]):
+        self.resolve_list(statements)
+        self.interpreter.frame_size = self.frame.size
+
     def resolve_list(self, statements: list[Stmt]):
         for statement in statements:
             self.resolve(statement)
 
     def resolve(self, obj: 'Stmt or Expr'):
-        obj.accept(self)
+        self.visits[obj.kind](obj)
 
     def resolve_local(self, expr: Expr, name: Token, is_read: bool):
         for i in range(len(self.scopes)-1,-1,-1):
             if name.lexeme in self.scopes[i]:
                 self.interpreter.resolve(expr, len(self.scopes) - i - 1, self.scopes[i][name.lexeme][1])
+                self.address(expr, self.scope_frames[i], self.scopes[i][name.lexeme])
                 if is_read:
                     self.scopes[i][name.lexeme][0].state = VarState.READ
                 return
 
+    # The function returns the index of the innermost scope that declares the name, or None for a global name.
+    def find(self, name: str) -> int:
+        for i in range(len(self.scopes)-1,-1,-1):
+            if name in self.scopes[i]:
+                return i
+        return None
+
+    # The function gives a node the address of the variable it refers to in the tree-walker's frames.
+    # A local of the current frame is read from its slot, until it turns out to be captured, and a local of an enclosing
+    # frame is read from a cell the current function captures.
+    def address(self, expr: 'Expr or Stmt', owner: Frame, entry: tuple):
+        if owner is self.frame:
+            expr.access = Access.LOCAL
+            expr.index = entry[2]
+            owner.references.setdefault(entry[2], []).append(expr)
+        else:
+            expr.access = Access.UPVALUE
+            expr.index = self.capture(self.frame, owner, entry)
+
+    # The function returns the index of the cell through which the frame's function reaches a variable of the owner frame,
+    # the functions in between capture the cell as well so they can pass it on.
+    def capture(self, frame: Frame, owner: Frame, entry: tuple) -> int:
+        variable, _, slot = entry
+        index = frame.upvalue_indices.get(variable)
+        if index is not None:
+            return index
+        if frame.enclosing is owner:
+            owner.captured.add(slot)
+            source = (True, None if variable.name.type_ == TokenType.THIS else slot)
+        else:
+            source = (False, self.capture(frame.enclosing, owner, entry))
+        index = len(frame.upvalues)
+        frame.upvalues.append(source)
+        frame.upvalue_indices[variable] = index
+        if source == (True, None):
+            frame.this_index = index
+        return index
+
+    # The function allocates a slot in the current frame.
+    def allocate(self) -> int:
+        self.frame.size += 1
+        return self.frame.size - 1
+
     def begin_scope(self):
         self.scopes.append({})
+        self.scope_frames.append(self.frame)
 
+    # Once a scope ends, all of the nodes which refer to its captured locals are known, and they reach the locals through cells.
     def end_scope(self):
         ending = self.scopes.pop()
+        frame = self.scope_frames.pop()
         for entry in ending:
             if ending[entry][0].state != VarState.READ:
                 self.error_handler.error_on_token(ending[entry][0].name, "Local variable not used.")
+            slot = ending[entry][2]
+            references = frame.references.pop(slot, ())
+            if slot in frame.captured:
+                for expr in references:
+                    expr.access = Access.CELL
 
 
-    def declare(self, name: Token):
+    # The node of a declaration gets the address of its variable, a global declaration keeps no access.
+    def declare(self, name: Token, declaration: Stmt = None):
         if not self.scopes:
             return None
         peek = self.scopes[-1]
         if name.lexeme in peek:
             self.error_handler.error_on_token(name,"Variable with this name has already been declared in this scope.")
-        peek[name.lexeme] = (Variable(name, VarState.DECLARED),len(peek))
+        peek[name.lexeme] = (Variable(name, VarState.DECLARED),len(peek), self.allocate())
+        if declaration is not None:
+            self.address(declaration, self.frame, peek[name.lexeme])
     
     def define(self, name: Token, ignore_state=False):
         if not self.scopes:
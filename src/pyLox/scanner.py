@@ -1,217 +1,225 @@
 '''
 The module serves as our lexer/scanner whose job is to scan the file and create tokens based on the input.
+The scanner is table driven: a single compiled regular expression recognizes a whole token - or a whole run of whitespace or a comment -
+in one step, and the tables below turn what it recognized into a token type.
+The source is either a string or a text file. A file is read in chunks and its tokens are yielded one by one as the parser asks for them,
+so only a chunk of the source and a few tokens are held in memory at any time.
+Identifier lexemes are interned, so every occurrence of a name shares one string, and comparing names or looking them up in the
+resolver's scopes, the globals and the fields of an instance starts with an identity check that succeeds.
 '''
+import re
+import gc
 import sys
 from token import Token
 from token_type import TokenType
 from error_handler import ErrorHandler
+from numeric import exact
 from collections import namedtuple
 
 DoubleToken = namedtuple("DoubleSingle", "single, double")
 
+# A dictionary of keywords that have no operands which matches a string to the matching token type
+keywords = {
+    "and" : TokenType.AND,
+    "break" : TokenType.BREAK,
+    "class" : TokenType.CLASS,
+    "else" : TokenType.ELSE,
+    "false" : TokenType.FALSE,
+    "for" : TokenType.FOR,
+    "fun" : TokenType.FUN,
+    "if" : TokenType.IF,
+    "nil" : TokenType.NIL,
+    "or" : TokenType.OR,
+    #"print" : TokenType.PRINT,
+    "return" : TokenType.RETURN,
+    "super" : TokenType.SUPER,
+    "this" : TokenType.THIS,
+    "true" : TokenType.TRUE,
+    "var" : TokenType.VAR,
+    "while" : TokenType.WHILE
+    }
+
+# A dictionary which matches strings of keywords of expressions whose role changes based on the following token to the matching token type
+double_keys = {
+    "!" : DoubleToken(TokenType.BANG, TokenType.BANG_EQUAL),
+    "=" : DoubleToken(TokenType.EQUAL, TokenType.EQUAL_EQUAL),
+    "<" : DoubleToken(TokenType.LESS, TokenType.LESS_EQUAL),
+    ">" : DoubleToken(TokenType.GREATER, TokenType.GREATER_EQUAL)
+    }
+
+# A dictionary which matches strings of keywords of tokens who have one role to the matching token type.
+single_keys = {
+    "(" : TokenType.LEFT_PAREN,
+    ")" : TokenType.RIGHT_PAREN,
+    "{" : TokenType.LEFT_BRACE,
+    "}" : TokenType.RIGHT_BRACE,
+    "," : TokenType.COMMA,
+    "." : TokenType.DOT,
+    "-" : TokenType.MINUS,
+    "+" : TokenType.PLUS,
+    ";" : TokenType.SEMICOLON,
+    "*" : TokenType.STAR,
+    "/" : TokenType.SLASH,
+    "?" : TokenType.QUESTION
+    }
+
+# Every operator lexeme matched to its token type, built from the two tables above.
+operators = dict(single_keys)
+for key, types in double_keys.items():
+    operators[key] = types.single
+    operators[key + "="] = types.double
+
+# The rules of the scanner's regular expression, which are tried in order so the most common ones come first.
+# Every rule is a group of the expression, the number of the group that matched tells what was recognized.
+token_rules = [
+    r"[A-Za-z_][A-Za-z0-9_]*",
+    r"[!=<>]=?|[(){},.\-+;*]|/(?![/*])",
+    r"\n+",
+    r"[0-9]+(?:\.[0-9]+)?",
+    r'"[^"]*"?',
+    r"//[^\n]*",
+    r"/\*",
+    r"[?:]",
+    r"[ \t\r]+",
+    r"."
+    ]
+IDENTIFIER, OPERATOR, NEWLINE, NUMBER, STRING, COMMENT, BLOCK_COMMENT, CONDITIONAL, SPACE, OTHER = range(1, len(token_rules) + 1)
+# The whitespace that follows a token is matched together with it, the SPACE rule only matches the whitespace the source starts with.
+token_pattern = re.compile("(?:" + "|".join(f"({rule})" for rule in token_rules) + r")[ \t\r]*", re.DOTALL)
+
+# The characters a block comment cares about, everything in between is skipped at once.
+comment_pattern = re.compile(r'[\n/*]')
+
+# The number of characters read from a source file at a time.
+CHUNK_SIZE = 1 << 16
+
 
 class Scanner:
-    def __init__(self, error_handler: ErrorHandler, source: str):
-        self.source = source
+    def __init__(self, error_handler: ErrorHandler, source: 'str or TextIO'):
         self.error_handler = error_handler
         self.tokens = []
-
-        self.start = 0
-        self.current = 0
         self.line = 1
-
-        # A dictionary of keywords that have no operands which matches a string to the matching token type
-        self.keywords = { 
-            "and" : TokenType.AND,
-            "break" : TokenType.BREAK,
-            "class" : TokenType.CLASS,
-            "else" : TokenType.ELSE,
-            "false" : TokenType.FALSE,
-            "for" : TokenType.FOR,
-            "fun" : TokenType.FUN,
-            "if" : TokenType.IF,
-            "nil" : TokenType.NIL,
-            "or" : TokenType.OR,
-            #"print" : TokenType.PRINT,
-            "return" : TokenType.RETURN,
-            "super" : TokenType.SUPER,
-            "this" : TokenType.THIS,
-            "true" : TokenType.TRUE,
-            "var" : TokenType.VAR,
-            "while" : TokenType.WHILE
-            }
-
-        # A dictionary which matches strings of keywords of expressions whose role changes based on the following token to the matching token type
-        self.double_keys = {
-            "!" : DoubleToken(TokenType.BANG, TokenType.BANG_EQUAL),
-            "=" : DoubleToken(TokenType.EQUAL, TokenType.EQUAL_EQUAL),
-            "<" : DoubleToken(TokenType.LESS, TokenType.LESS_EQUAL),
-            ">" : DoubleToken(TokenType.GREATER, TokenType.GREATER_EQUAL)
-            }
-
-        # A dictionary which matches strings of keywords of tokens who have one role to the matching token type.
-        self.single_keys = {
-            "(" : TokenType.LEFT_PAREN,
-            ")" : TokenType.RIGHT_PAREN,
-            "{" : TokenType.LEFT_BRACE,
-            "}" : TokenType.RIGHT_BRACE,
-            "," : TokenType.COMMA,
-            "." : TokenType.DOT,
-            "-" : TokenType.MINUS,
-            "+" : TokenType.PLUS,
-            ";" : TokenType.SEMICOLON,
-            "*" : TokenType.STAR
-            }
-    
+        # The part of the source that wasn't scanned yet, and whether it holds the whole rest of the source.
+        if isinstance(source, str):
+            self.reader = None
+            self.buffer = source
+            self.at_end = True
+        else:
+            self.reader = source
+            self.buffer = ""
+            self.at_end = False
 
     # The function scans the file and creates tokens based on the input.
+    # The tokens never form garbage, so the cyclic garbage collector is paused instead of scanning the growing list over and over again.
     def scan_tokens(self) -> list[Token]:
-        while not self.is_at_end():
-            self.start = self.current
-            self.scan_token()
-        self.tokens.append(Token(TokenType.EOF, "", None, self.line))
-        return self.tokens
-
-    def is_at_end(self) -> bool:
-        return self.current >= len(self.source)
-    
-    # The function creates a token based on the current character in the file.
-    def scan_token(self):
-        char = self.advance()
-        if char in self.single_keys:
-            self.add_token(self.single_keys.get(char))
-        elif char in self.double_keys:
-            if(self.match('=')):
-                self.add_token(self.double_keys[char].double)
-            else:
-                self.add_token(self.double_keys[char].single)
-        elif char == '/':
-            if self.peek() == '*':
-                self.skip_comment()
-            elif self.match('/'):
-                while self.peek() != '\n' and not self.is_at_end():
-                    self.advance()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.tokens.extend(self.stream_tokens())
+            return self.tokens
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    # The function drops the part of the buffer before the given position and reads the next chunk of the source file into it.
+    # It returns the position in the new buffer.
+    def refill(self, current: int) -> int:
+        chunk = self.reader.read(CHUNK_SIZE)
+        if not chunk:
+            self.at_end = True
+        self.buffer = self.buffer[current:] + chunk
+        return 0
+
+    # The function is a generator which yields the tokens of the source one at a time.
+    def stream_tokens(self) -> 'Iterator[Token]':
+        error = self.error_handler.error
+        finditer = token_pattern.finditer
+        get_keyword = keywords.get
+        intern = sys.intern
+        identifier = TokenType.IDENTIFIER
+        # The number of ternary conditionals whose ':' seperator wasn't scanned yet.
+        conditionals = 0
+        line = 1
+        current = 0
+        while current < len(self.buffer) or not self.at_end:
+            buffer = self.buffer
+            # A token that ends near the end of a chunk might go on in the next one, so it is scanned again after a refill.
+            limit = len(buffer) if self.at_end else len(buffer) - 2
+            for token in finditer(buffer, current):
+                if token.end() > limit:
+                    current = self.refill(token.start())
+                    break
+                kind = token.lastindex
+                if kind == IDENTIFIER:
+                    text = intern(token[kind])
+                    yield Token(get_keyword(text, identifier), text, None, line)
+                elif kind == OPERATOR:
+                    text = token[kind]
+                    yield Token(operators[text], text, None, line)
+                elif kind == NEWLINE:
+                    line += len(token[kind])
+                # A number with a fraction is a float, and an integer otherwise.
+                elif kind == NUMBER:
+                    text = token[kind]
+                    yield Token(TokenType.NUMBER, text, float(text) if "." in text else exact(int(text)), line)
+                elif kind == STRING:
+                    text = token[kind]
+                    line += text.count("\n")
+                    if len(text) == 1 or text[-1] != '"':
+                        error(line, "Unterminated String.")
+                    else:
+                        yield Token(TokenType.STRING, text, text[1:-1], line)
+                elif kind == BLOCK_COMMENT:
+                    # The comment is skipped by hand, and the scanning continues after it.
+                    self.line = line
+                    current = self.skip_comment(token.start(kind) + 1)
+                    line = self.line
+                    break
+                elif kind == CONDITIONAL:
+                    # The ':' seperator of a ternary conditional isn't a token, the parser finds the else branch on its own.
+                    if token[kind] == "?":
+                        yield Token(TokenType.QUESTION, "?", None, line)
+                        conditionals += 1
+                    elif conditionals > 0:
+                        conditionals -= 1
+                    else:
+                        error(line, "Unexpected character.")
+                elif kind == OTHER:
+                    error(line, "Unexpected character.")
             else:
-                self.add_token(TokenType.SLASH)
-        elif char == '?':
-            self.add_conditional()
-        elif char in ['', '\r', '\t', ' ']:
-            pass
-        elif char == '\n':
-            self.line += 1
-        elif char =='"':
-            self.string()
-        elif self.is_digit(char):
-            self.number()
-        elif self.is_alpha(char):
-            self.identifier()
-        else:
-            self.error_handler.error(self.line, "Unexpected character.")
-
-    def advance(self) -> chr:
-        char = self.peek()
-        self.current += 1
-        return char
-    
-    def add_token(self, type_: TokenType, literal=None):
-        text = self.source[self.start:self.current]
-        self.tokens.append(Token(type_, text, literal, self.line))
-
-    def match(self, expected: chr) -> bool:
-        if self.is_at_end():
-            return False
-        if self.source[self.current] != expected:
-            return False
-        self.current += 1
-        return True
-    
-    def peek(self) -> chr:
-        if self.is_at_end():
-            return "\0"
-        return self.source[self.current]
-
-    def string(self):
-        while self.peek() != '"' and not self.is_at_end():
-            if self.peek() == '\n':
-                self.line += 1
-            self.advance()
-        if self.is_at_end():
-            self.error_handler.error(line, "Unterminated String.")
-            return None
-        self.advance()
-        value = self.source[self.start+1:self.current-1]
-        self.add_token(TokenType.STRING, value)
-
-    def is_digit(self, char: chr ) -> bool:
-        return char >= '0' and char <= '9'
-
-    def number(self):
-        while self.is_digit(self.peek()):
-            self.advance()
-        if self.peek() == '.' and self.is_digit(self.peek_next()):
-            self.advance()
-            while self.is_digit(self.peek()):
-                self.advance()
-        self.add_token(TokenType.NUMBER, float(self.source[self.start:self.current]))
-
-    def peek_next(self) -> chr:
-        if self.current + 1 >= len(self.source):
-            return '\0'
-        return self.source[self.current+1]
-    
-    def is_alpha(self, char: chr) -> chr:
-        return (char >= 'a' and char <= 'z') or (char >='A' and char <= 'Z') or char == '_'
-    
-    def is_alpha_numeric(self,char: chr) -> chr:
-        return self.is_digit(char) or self.is_alpha(char)
-
-
-    # The function scans an identifier token from the source file.
-    def identifier(self):
-        while self.is_alpha_numeric(self.peek()):
-            self.advance()
-        
-        text = self.source[self.start:self.current]
-        type_ = TokenType.IDENTIFIER
-        if text in self.keywords:
-            type_ = self.keywords[text]
-        self.add_token(type_)
-    
-    def skip_comment(self):
-        comment_lines =[self.line]
+                if self.at_end:
+                    break
+                current = self.refill(len(buffer))
+        for _ in range(conditionals):
+            error(line, " Expect ':' seperator after then branch in ternary conditional.")
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
+
+    # The function skips a possibly nested comment block which starts at the given '*', and returns the position after it.
+    # Like it always did, the scanner skips the character that follows the closing '*/' as well.
+    def skip_comment(self, current: int) -> int:
+        comment_lines = [self.line]
         nesting = 1
         while nesting > 0:
-            if self.is_at_end():
+            found = comment_pattern.search(self.buffer, current)
+            # The closing '*/' and the character after it have to be in the buffer.
+            if not self.at_end and (found is None or found.start() + 2 >= len(self.buffer)):
+                current = self.refill(len(self.buffer) if found is None else found.start())
+                continue
+            if found is None:
                 for line in comment_lines:
                     self.error_handler.error(line, "Unterminated comment block.")
-                return
-            if self.peek() == '\n':
+                return len(self.buffer)
+            current = found.start()
+            char = self.buffer[current]
+            next_char = self.buffer[current+1] if current + 1 < len(self.buffer) else '\0'
+            if char == '\n':
                 self.line += 1
-            if self.peek() == '/' and self.peek_next() == '*':
+            elif char == '/' and next_char == '*':
                 comment_lines.append(self.line)
                 nesting += 1
-            if self.peek() =='*' and self.peek_next() =='/':
+            elif char == '*' and next_char == '/':
                 nesting -= 1
-                self.advance()
-                self.advance()
-            self.advance()
-
-    # adds tokens for a ternary conditional expression.
-    def add_conditional(self):
-        self.add_token(TokenType.QUESTION)
-        while not self.match(':'):
-            if self.is_at_end():
-                self.error_handler.error(self.line, " Expect ':' seperator after then branch in ternary conditional.")
-                return
-            self.start = self.current
-            self.scan_token()
-        self.current -= 1
-        #self.add_token(TokenType.COLON)
-        self.advance()
-            
-        
-        
-    
-    
-
-    
+                current += 2
+            current += 1
+        return current
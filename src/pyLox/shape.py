@@ -0,0 +1,28 @@
+'''
+The module houses the definition of a shape - a hidden class which describes the fields of an object.
+A shape maps the names of the fields to their indices in the object's list of values, so objects which got the same fields in the
+same order share one shape, and an object holds only the values of its fields.
+Adding a field to an object moves it to the shape that follows its shape by the field's name - the transition - which is created
+the first time any object takes it, and shared afterwards.
+'''
+
+class Shape:
+    __slots__ = ("indices", "transitions")
+
+    def __init__(self, indices: dict[str, int]):
+        self.indices = indices
+        self.transitions = {}
+
+    # The function returns the shape of an object of this shape once the given field is added to it.
+    def add(self, name: str) -> 'Shape':
+        shape = self.transitions.get(name)
+        if shape is None:
+            indices = dict(self.indices)
+            indices[name] = len(indices)
+            shape = Shape(indices)
+            self.transitions[name] = shape
+        return shape
+
+
+# The shape of an object without fields, which every object starts with.
+EMPTY = Shape({})
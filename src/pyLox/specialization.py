@@ -0,0 +1,59 @@
+'''
+The module houses the specialized operations that the tree-walker's binary expressions rewrite themselves into.
+The first time a binary expression is evaluated, it specializes on the types of its operands: it keeps the operation which computes
+the operator for exactly those types, without dispatching on the operator or checking the operands.
+Afterwards the expression only checks that the operands still have those types - the guard - before calling the operation.
+A specialized operation returns None for operands the generic path reports an error for - a division by zero - which then reports it.
+An expression whose operands keep changing types stops specializing, and stays generic.
+'''
+import operator
+from token_type import TokenType
+from numeric import divide, add, subtract, multiply
+
+# The number of times an expression specializes before it stays generic.
+MAX_SPECIALIZATIONS = 4
+NUMBERS = (int, float)
+COMPARISONS = {
+               TokenType.LESS : operator.lt,
+               TokenType.LESS_EQUAL : operator.le,
+               TokenType.GREATER : operator.gt,
+               TokenType.GREATER_EQUAL : operator.ge,
+               TokenType.EQUAL_EQUAL : operator.eq,
+               TokenType.BANG_EQUAL : operator.ne
+              }
+# Only integers can produce a result that isn't exactly representable, so an operator on a float uses Python's operator as it is.
+ARITHMETIC = {
+              TokenType.PLUS : operator.add,
+              TokenType.MINUS : operator.sub,
+              TokenType.STAR : operator.mul
+             }
+INTEGER_ARITHMETIC = {
+                      TokenType.PLUS : add,
+                      TokenType.MINUS : subtract,
+                      TokenType.STAR : multiply
+                     }
+
+
+# A division by zero is left to the generic path, which reports it.
+def checked_divide(left: 'int or float', right: 'int or float') -> 'int or float':
+    if right == 0:
+        return None
+    return divide(left, right)
+
+
+specializations = {}
+for left in NUMBERS:
+    for right in NUMBERS:
+        for type_, operation in (INTEGER_ARITHMETIC if left is int and right is int else ARITHMETIC).items():
+            specializations[(type_, left, right)] = operation
+        specializations[(TokenType.SLASH, left, right)] = checked_divide
+        for type_, operation in COMPARISONS.items():
+            specializations[(type_, left, right)] = operation
+for type_, operation in COMPARISONS.items():
+    specializations[(type_, str, str)] = operation
+specializations[(TokenType.PLUS, str, str)] = operator.add
+
+
+# The function returns the operation which computes the operator for the given types of operands, or None if there's no such operation.
+def specialize(type_: TokenType, left: type, right: type):
+    return specializations.get((type_, left, right))
@@ -2,15 +2,19 @@
 The module houses definitions for all of the statements that can be encountered in a lox file.
 We use the visitor design pattern to execute statements so each statement will have the accept method.
 The Print statement is hidden in a comment as I changed it to be a native function.
+Like the expressions, the statements declare their fields in slots.
 '''
 from abc import ABC, abstractmethod
 from expr import Expr
 from token import Token 
 
 class Stmt:
-    pass
+    __slots__ = ()
 
 class Expression(Stmt):
+    __slots__ = ("expr",)
+    kind = 14
+
     def __init__(self, expr: Expr):
         self.expr = expr
 
@@ -25,21 +29,35 @@ class Print(Stmt):
         return visitor.visit_print_stmt(self)
 '''
 class Var(Stmt):
+    __slots__ = ("name", "initializer", "access", "index")
+    kind = 15
+
     def __init__(self, name: Token, initializer: Expr):
         self.name = name
         self.initializer = initializer
+        # The tree-walker's address of the variable, which the resolver fills in.
+        self.access = None
+        self.index = None
 
     def accept(self, visitor):
         return visitor.visit_var_stmt(self)
 
 class Block(Stmt):
+    __slots__ = ("statements", "scoped")
+    kind = 16
+
     def __init__(self, statements: list[Stmt]):
         self.statements = statements
+        # Whether the block declares variables, the resolver fills it in. A block without a scope of its own gets no environment.
+        self.scoped = True
 
     def accept(self, visitor):
         return visitor.visit_block_stmt(self)
 
 class If(Stmt):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    kind = 17
+
     def __init__(self, condition: Expr, then_branch: Stmt, else_branch: Stmt):
         self.condition = condition
         self.then_branch = then_branch
@@ -49,14 +67,23 @@ class If(Stmt):
         return visitor.visit_if_stmt(self)
 
 class Fun(Stmt):
+    __slots__ = ("name", "function", "access", "index")
+    kind = 18
+
     def __init__(self, name: Token, function: "Function"):
         self.name = name
         self.function = function
+        # The tree-walker's address of the function's variable, which the resolver fills in.
+        self.access = None
+        self.index = None
 
     def accept(self, visitor):
         return visitor.visit_fun_stmt(self)
 
 class Return(Stmt):
+    __slots__ = ("keyword", "value")
+    kind = 19
+
     def __init__(self, keyword: Token, value: Expr):
         self.keyword = keyword
         self.value = value
@@ -65,28 +92,49 @@ class Return(Stmt):
         return visitor.visit_return_stmt(self)
 
 class Class(Stmt):
+    __slots__ = ("name", "super_class", "methods", "class_methods", "depth", "slot", "access", "index", "super_index")
+    kind = 20
+
     def __init__(self, name: Token, super_class :"Class", methods: list[Stmt], class_methods: list[Stmt]):
         self.name = name
         self.super_class = super_class
         self.methods = methods
         self.class_methods = class_methods
+        # The address of the class's variable, which the resolver fills in.
+        self.depth = None
+        self.slot = None
+        self.access = None
+        self.index = None
+        # The slot of the tree-walker's frame which holds the cell of the superclass.
+        self.super_index = None
     
     def accept(self, visitor):
         return visitor.visit_class_stmt(self)
 
 
 class While(Stmt):
+    __slots__ = ("condition", "body", "counted")
+    kind = 21
+
     def __init__(self, condition: Expr, body: Stmt):
         self.condition = condition
         self.body = body
+        # The counted loop that the optimizer recognized in the loop, which the tree-walker runs natively.
+        self.counted = None
 
     def accept(self, visitor):
         return visitor.visit_while_stmt(self)
 
 class Break(Stmt):
+    __slots__ = ()
+    kind = 22
+
     def __init__(self):
         pass
 
     def accept(self, visitor):
         return visitor.visit_break_stmt(self)
 
+
+# The names of the visit functions of the statements, in the order of their kinds.
+stmt_visits = ["visit_expression_stmt", "visit_var_stmt", "visit_block_stmt", "visit_if_stmt", "visit_fun_stmt", "visit_return_stmt", "visit_class_stmt", "visit_while_stmt", "visit_break_stmt"]
@@ -1,14 +1,21 @@
 '''
 The module houses the definition of a token.
+A token has no __dict__, its fields are stored in slots, which makes it a lot smaller and faster to create.
 '''
 from token_type import TokenType
 
 class Token():
+    __slots__ = ("type_", "lexeme", "literal", "line")
+
     def __init__(self, type_: int, lexeme: str, literal: object, line: int):
         self.type_ = type_
         self.lexeme = lexeme
         self.literal = literal
         self.line = line
     
+    # A token is pickled as the arguments it's created with, which is many times faster than pickling its slots.
+    def __reduce__(self) -> tuple:
+        return (Token, (self.type_, self.lexeme, self.literal, self.line))
+
     def __str__(self) -> str:
         return f"{self.type_} {self.lexeme} {self.literal}"
\ No newline at end of file
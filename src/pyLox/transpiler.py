@@ -0,0 +1,769 @@
+'''
+The module serves as the transpiler, an alternative to the tree-walker which translates a resolved Lox program into Python source code,
+compiles it with Python's own compiler and runs the resulting code object.
+Lox loops become Python loops and Lox locals become Python locals, so the bulk of the work happens inside CPython's own eval loop.
+The translation has two passes:
+1. The capture analyzer mirrors the resolver's scopes, binds every variable reference to its declaration and finds the variables that
+   are captured by a nested function.
+2. The code generator emits the Python source. Captured variables live in one item lists - cells - which a nested function receives as
+   keyword-only defaults, so a closure created in a loop iteration keeps that iteration's variable, just like a Lox environment.
+Everything that has to behave exactly like the tree-walker - type checks, number formatting, error messages - is left to the runtime
+helpers the generated code calls, which reuse the tree-walker's classes.
+The resulting code object doesn't reference the syntax tree, which allows the Lox front end to cache it on disk with marshal.
+'''
+import marshal
+from typing import Any, Callable
+from visitor import Visitor
+from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
+from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
+from token import Token
+from token_type import TokenType
+from function_type import FunctionType
+from error import LoxRunTimeError, DivisionByZeroError, BreakException
+from error_handler import ErrorHandler
+from run_mode import RunMode
+from Lox_callable import LoxCallable
+from Lox_function import LoxFunction
+from Lox_class import LoxClass
+from Lox_instance import LoxInstance
+from interpreter import Interpreter
+from numeric import divide as divide_numbers, negate as negate_number, add as add_numbers, subtract as subtract_numbers, multiply as multiply_numbers
+
+UNBOUND = object()
+
+
+# A Lox function translated into a Python function, methods receive the bound instance as their first argument.
+class TranspiledFunction(LoxFunction):
+    __slots__ = ("function", "params", "type_", "this")
+
+    def __init__(self, function: Callable, name: str, params: int, type_: FunctionType, this=UNBOUND):
+        super().__init__(name, None, None, False)
+        self.function = function
+        self.params = params
+        self.type_ = type_
+        self.this = this
+
+    def call(self, interpreter, arguments: list[Any]):
+        if self.this is UNBOUND:
+            return self.function(*arguments)
+        return self.function(self.this, *arguments)
+
+    def arity(self):
+        return self.params
+
+    # This function binds a function to an instance.
+    def bind(self, instance):
+        return TranspiledFunction(self.function, self.name, self.params, self.type_, instance)
+
+    def is_getter(self):
+        return self.type_ == FunctionType.GETMETHOD
+
+
+class PythonInterpreter(Interpreter):
+    def __init__(self, error_handler: ErrorHandler):
+        super().__init__(error_handler)
+        self.runtime = self.create_runtime()
+
+    def interpret(self, statements: list[Stmt], mode: RunMode):
+        self.run_code(self.compile(statements, mode))
+
+    def compile(self, statements: list[Stmt], mode: RunMode):
+        source = Transpiler(self).transpile(statements, mode)
+        return compile(source, "<lox>", "exec")
+
+    # A Lox call is a Python call, so recursion that's too deep for Python is reported as a stack overflow, like the VM reports it.
+    def run_code(self, code):
+        # Every run gets its own namespace, so the token constants of one REPL line don't overwrite those of functions defined earlier.
+        namespace = dict(self.runtime)
+        try:
+            exec(code, namespace)
+            namespace["_main"]()
+        except LoxRunTimeError as error:
+            self.error_handler.runtime_error(error)
+        except RecursionError as error:
+            self.error_handler.runtime_error(LoxRunTimeError(self.overflowed_call(error), "Stack overflow."))
+
+    # The function returns the token of the innermost call - or getter - that the stack overflowed in.
+    def overflowed_call(self, error: RecursionError) -> Token:
+        tokens = {self.runtime["_call"].__code__ : "paren", self.runtime["_get"].__code__ : "name"}
+        token = None
+        traceback = error.__traceback__
+        while traceback is not None:
+            frame = traceback.tb_frame
+            if frame.f_code in tokens:
+                token = frame.f_locals[tokens[frame.f_code]]
+            traceback = traceback.tb_next
+        return token
+
+    # The functions return the code object as bytes to be stored in the compile cache, and back.
+    def dump_code(self, code) -> bytes:
+        return marshal.dumps(code)
+
+    def load_code(self, data: bytes):
+        try:
+            return marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    # The function creates the helpers the generated code calls, they mirror the tree-walker's visit functions.
+    def create_runtime(self) -> dict:
+        interpreter = self
+        globals_ = self.globals
+        stringify = self.stringify
+        uninitialized = Interpreter.uninitialized
+
+        def tok(type_: str, lexeme: str, line: int) -> Token:
+            return Token(TokenType[type_], lexeme, None, line)
+
+        def global_error(name: str, token: Token):
+            if name in globals_:
+                raise LoxRunTimeError(token, "Variable must be initialized before use.")
+            raise LoxRunTimeError(token, f"Undefined variable {name}.")
+
+        def uninitialized_error(token: Token):
+            raise LoxRunTimeError(token, "Variable must be initialized before use.")
+
+        def set_global(name: str, value: Any, token: Token) -> Any:
+            if name not in globals_:
+                raise LoxRunTimeError(token, f"Undefined variable {name}.")
+            globals_[name] = value
+            return value
+
+        def set_cell(cell: list, value: Any) -> Any:
+            cell[0] = value
+            return value
+
+        def echo(value: Any):
+            print(stringify(value))
+
+        def check_numbers(operator: Token, left: Any, right: Any):
+            if (type(left) is not float and type(left) is not int) or (type(right) is not float and type(right) is not int):
+                raise LoxRunTimeError(operator, "Operands must be numbers.")
+
+        def add(left: Any, right: Any, operator: Token) -> Any:
+            if (type(left) is float or type(left) is int) and (type(right) is float or type(right) is int):
+                return add_numbers(left, right)
+            if type(left) is str or type(right) is str:
+                return stringify(left) + stringify(right)
+            raise LoxRunTimeError(operator, "Operands must either strings or numbers.")
+
+        def subtract(left: Any, right: Any, operator: Token) -> Any:
+            check_numbers(operator, left, right)
+            return subtract_numbers(left, right)
+
+        def multiply(left: Any, right: Any, operator: Token) -> Any:
+            check_numbers(operator, left, right)
+            return multiply_numbers(left, right)
+
+        def divide(left: Any, right: Any, operator: Token) -> Any:
+            if right == 0:
+                raise DivisionByZeroError(operator)
+            check_numbers(operator, left, right)
+            return divide_numbers(left, right)
+
+        def comparison(op_func: Callable) -> Callable:
+            def compare(left: Any, right: Any, operator: Token) -> bool:
+                if not ((type(left) is str and type(right) is str) or
+                        ((type(left) is float or type(left) is int) and (type(right) is float or type(right) is int))):
+                    raise LoxRunTimeError(operator, "Operands must all be of the same type.")
+                return op_func(left, right)
+            return compare
+
+        def negate(right: Any) -> Any:
+            return negate_number(right)
+
+        def select(condition: Any, then_branch: Any, else_branch: Any) -> Any:
+            if condition is None or condition is False:
+                return else_branch
+            return then_branch
+
+        def function(function: Callable, name: str, params: int, type_: str) -> TranspiledFunction:
+            return TranspiledFunction(function, name, params, FunctionType[type_])
+
+        def callee(callee: Any, paren: Token) -> Any:
+            if not isinstance(callee, LoxCallable):
+                raise LoxRunTimeError(paren, "Can only call functions and classes.")
+            return callee
+
+        def call(callee: Any, paren: Token, *arguments: Any) -> Any:
+            if type(callee) is TranspiledFunction:
+                if len(arguments) != callee.params:
+                    raise LoxRunTimeError(paren, f"Expected {callee.params} arguments but got {len(arguments)}.")
+                if callee.this is UNBOUND:
+                    return callee.function(*arguments)
+                return callee.function(callee.this, *arguments)
+            if not isinstance(callee, LoxCallable):
+                raise LoxRunTimeError(paren, "Can only call functions and classes.")
+            if len(arguments) != callee.arity():
+                raise LoxRunTimeError(paren, f"Expected {callee.arity()} arguments but got {len(arguments)}.")
+            return callee.call(interpreter, list(arguments))
+
+        def get(obj: Any, name: Token) -> Any:
+            if not isinstance(obj, LoxInstance):
+                raise LoxRunTimeError(name, "Only instances have properties.")
+            result = obj.get(name)
+            if isinstance(result, LoxFunction) and result.is_getter():
+                result = result.call(interpreter, [])
+            return result
+
+        def instance(obj: Any, name: Token) -> LoxInstance:
+            if not isinstance(obj, LoxInstance):
+                raise LoxRunTimeError(name, "Only instances have properties.")
+            return obj
+
+        def set_(obj: LoxInstance, name: Token, value: Any) -> Any:
+            obj.set(name, value)
+            return value
+
+        def super_(super_class: LoxClass, obj: LoxInstance, method_name: Token) -> TranspiledFunction:
+            method = super_class.find_method(method_name.lexeme)
+            if method is None:
+                raise LoxRunTimeError(method_name, f"Undefined propery {method_name.lexeme}.")
+            return method.bind(obj)
+
+        def super_class(super_class: Any, name: Token) -> LoxClass:
+            if not isinstance(super_class, LoxClass):
+                raise LoxRunTimeError(name, "Superclass must be a class.")
+            return super_class
+
+        def class_(name: str, super_class: LoxClass, methods: dict, class_methods: dict) -> LoxClass:
+            metaclass = LoxClass(None, None, f'{name}metaclass', class_methods)
+            return LoxClass(metaclass, super_class, name, methods)
+
+        return {
+                "__builtins__" : __builtins__,
+                "_G" : globals_,
+                "_U" : uninitialized,
+                "_tok" : tok,
+                "_global_error" : global_error,
+                "_uninit" : uninitialized_error,
+                "_set_global" : set_global,
+                "_set_cell" : set_cell,
+                "_echo" : echo,
+                "_add" : add,
+                "_sub" : subtract,
+                "_mul" : multiply,
+                "_div" : divide,
+                "_lt" : comparison(lambda left, right: left < right),
+                "_le" : comparison(lambda left, right: left <= right),
+                "_gt" : comparison(lambda left, right: left > right),
+                "_ge" : comparison(lambda left, right: left >= right),
+                "_eq" : comparison(lambda left, right: left == right),
+                "_ne" : comparison(lambda left, right: left != right),
+                "_neg" : negate,
+                "_select" : select,
+                "_function" : function,
+                "_callee" : callee,
+                "_call" : call,
+                "_get" : get,
+                "_instance" : instance,
+                "_set" : set_,
+                "_super" : super_,
+                "_superclass" : super_class,
+                "_class" : class_,
+                "_Break" : BreakException
+               }
+
+
+# A local variable of the Lox program, which becomes a local variable of the Python function that owns it.
+class Declaration:
+    def __init__(self, name: str, pyname: str, owner: 'FunctionInfo', checked=False):
+        self.name = name
+        self.pyname = pyname
+        self.owner = owner
+        # A captured variable is stored in a cell, since a nested function uses it.
+        self.captured = False
+        # A variable declared without an initializer has to be checked before it is read.
+        self.checked = checked
+        # The 'this' of a class scope refers to the 'this' parameter of the method that is being analyzed.
+        self.binding = None
+
+
+# What the code generator needs to know about a function: its parameters, its 'this' and the cells it receives from enclosing functions.
+class FunctionInfo:
+    def __init__(self, pyname: str):
+        self.pyname = pyname
+        self.params = []
+        self.this = None
+        self.free = []
+
+
+class CaptureAnalyzer(Visitor):
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.scopes = []
+        self.functions = []
+        self.counter = 0
+        self.declarations = {}
+        self.references = {}
+        self.infos = {}
+        # The 'this' a super expression binds the method to, since it isn't referenced by the expression itself.
+        self.super_this = {}
+
+    def analyze(self, statements: list[Stmt]):
+        self.functions.append(FunctionInfo("_main"))
+        self.analyze_list(statements)
+
+    def analyze_list(self, statements: list[Stmt]):
+        for statement in statements:
+            self.analyze_node(statement)
+
+    def analyze_node(self, node: 'Stmt or Expr'):
+        node.accept(self)
+
+    def pyname(self, name: str) -> str:
+        self.counter += 1
+        return f"{name}_{self.counter}"
+
+    def declare(self, key: Any, name: str, checked=False) -> Declaration:
+        if not self.scopes:
+            return None
+        declaration = Declaration(name, self.pyname(name), self.functions[-1], checked)
+        self.scopes[-1][name] = declaration
+        self.declarations[key] = declaration
+        return declaration
+
+    # The function finds the declaration of a resolved reference and marks it captured if the reference is in a nested function.
+    def lookup(self, expr: Expr, name: str, depth: int) -> Declaration:
+        declaration = self.scopes[-1 - depth][name]
+        if declaration.binding is not None:
+            declaration = declaration.binding
+        if declaration.owner is not self.functions[-1]:
+            declaration.captured = True
+            for info in reversed(self.functions):
+                if info is declaration.owner:
+                    break
+                if declaration not in info.free:
+                    info.free.append(declaration)
+        return declaration
+
+    def reference(self, expr: Expr, name: Token):
+        depth = expr.depth
+        if depth is not None:
+            self.references[expr] = self.lookup(expr, name.lexeme, depth)
+
+    def analyze_function(self, function: Function, name: str, this: Declaration):
+        info = FunctionInfo(self.pyname(f"_f_{name}"))
+        self.infos[function] = info
+        self.functions.append(info)
+        if this is not None:
+            info.this = Declaration("this", self.pyname("this"), info)
+            this.binding = info.this
+        self.scopes.append({})
+        for param in function.params:
+            info.params.append(self.declare(param, param.lexeme))
+        self.analyze_list(function.body)
+        self.scopes.pop()
+        if this is not None:
+            this.binding = None
+        self.functions.pop()
+
+    def visit_expression_stmt(self, stmt: Expression):
+        self.analyze_node(stmt.expr)
+
+    def visit_var_stmt(self, stmt: Var):
+        self.declare(stmt, stmt.name.lexeme, stmt.initializer is None)
+        if stmt.initializer is not None:
+            self.analyze_node(stmt.initializer)
+
+    # Like the resolver, a block without a scope of its own adds no scope.
+    def visit_block_stmt(self, stmt: Block):
+        if not stmt.scoped:
+            self.analyze_list(stmt.statements)
+            return None
+        self.scopes.append({})
+        self.analyze_list(stmt.statements)
+        self.scopes.pop()
+
+    def visit_if_stmt(self, stmt: If):
+        self.analyze_node(stmt.condition)
+        self.analyze_node(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.analyze_node(stmt.else_branch)
+
+    def visit_while_stmt(self, stmt: While):
+        self.analyze_node(stmt.condition)
+        self.analyze_node(stmt.body)
+
+    def visit_break_stmt(self, stmt: Break):
+        pass
+
+    def visit_return_stmt(self, stmt: Return):
+        if stmt.value is not None:
+            self.analyze_node(stmt.value)
+
+    def visit_fun_stmt(self, stmt: Fun):
+        self.declare(stmt, stmt.name.lexeme)
+        self.analyze_function(stmt.function, stmt.name.lexeme, None)
+
+    # The scopes are the ones the resolver creates for a class: the class name, 'super', and 'this' alongside the method names.
+    def visit_class_stmt(self, stmt: Class):
+        self.declare(stmt, stmt.name.lexeme)
+        if stmt.super_class is not None:
+            self.analyze_node(stmt.super_class)
+            self.scopes.append({})
+            self.declare((stmt, "super"), "super")
+        self.scopes.append({})
+        this = self.declare((stmt, "this"), "this")
+        for method in stmt.methods:
+            self.declare(method, method.name.lexeme)
+            self.analyze_function(method.function, method.name.lexeme, this)
+        self.scopes.pop()
+        for class_method in stmt.class_methods:
+            self.scopes.append({})
+            this = self.declare((class_method, "this"), "this")
+            self.declare(class_method, class_method.name.lexeme)
+            self.analyze_function(class_method.function, class_method.name.lexeme, this)
+            self.scopes.pop()
+        if stmt.super_class is not None:
+            self.scopes.pop()
+
+    def visit_assign_expr(self, expr: Assign):
+        self.analyze_node(expr.value)
+        self.reference(expr, expr.name)
+
+    def visit_binary_expr(self, expr: Binary):
+        self.analyze_node(expr.left)
+        self.analyze_node(expr.right)
+
+    def visit_conditional_expr(self, expr: Conditional):
+        self.analyze_node(expr.condition)
+        self.analyze_node(expr.then_branch)
+        self.analyze_node(expr.else_branch)
+
+    def visit_grouping_expr(self, expr: Grouping):
+        self.analyze_node(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal):
+        pass
+
+    def visit_logical_expr(self, expr: Logical):
+        self.analyze_node(expr.left)
+        self.analyze_node(expr.right)
+
+    def visit_unary_expr(self, expr: Unary):
+        self.analyze_node(expr.right)
+
+    def visit_variable_expr(self, expr: Variable):
+        self.reference(expr, expr.name)
+
+    def visit_function_expr(self, expr: Function):
+        self.analyze_function(expr, "lambda", None)
+
+    def visit_call_expr(self, expr: Call):
+        self.analyze_node(expr.callee)
+        for arg in expr.args:
+            self.analyze_node(arg)
+
+    def visit_get_expr(self, expr: Get):
+        self.analyze_node(expr.obj)
+
+    def visit_set_expr(self, expr: Set):
+        self.analyze_node(expr.value)
+        self.analyze_node(expr.obj)
+
+    def visit_this_expr(self, expr: This):
+        self.reference(expr, expr.keyword)
+
+    def visit_super_expr(self, expr: Super):
+        depth = expr.depth
+        self.references[expr] = self.lookup(expr, "super", depth)
+        self.super_this[expr] = self.lookup(expr, "this", depth - 1)
+
+
+class Transpiler(Visitor):
+    binary_helpers = {
+                      TokenType.PLUS : "_add",
+                      TokenType.MINUS : "_sub",
+                      TokenType.STAR : "_mul",
+                      TokenType.SLASH : "_div",
+                      TokenType.LESS : "_lt",
+                      TokenType.LESS_EQUAL : "_le",
+                      TokenType.GREATER : "_gt",
+                      TokenType.GREATER_EQUAL : "_ge",
+                      TokenType.EQUAL_EQUAL : "_eq",
+                      TokenType.BANG_EQUAL : "_ne"
+                     }
+    # Expressions that always evaluate to a boolean can be used as a Python condition as they are.
+    boolean_helpers = ("_lt", "_le", "_gt", "_ge", "_eq", "_ne")
+
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.analyzer = CaptureAnalyzer(interpreter)
+        self.lines = []
+        self.indent = 1
+        self.tokens = {}
+        # The function whose body is being generated, whether it is an initializer, and the number of its loops being generated.
+        self.function = None
+        self.is_initializer = False
+        self.loop_depth = 0
+
+    def transpile(self, statements: list[Stmt], mode: RunMode) -> str:
+        self.analyzer.analyze(statements)
+        self.function = self.analyzer.functions[0]
+        for statement in statements:
+            if mode == RunMode.REPL and type(statement) is Expression and type(statement.expr) is not Assign and type(statement.expr) is not Call:
+                self.emit(f"_echo({self.expression(statement.expr)})")
+            else:
+                self.statement(statement)
+        self.emit("return None")
+        header = [f"{name} = _tok({token.type_.name!r}, {token.lexeme!r}, {token.line!r})" for token, name in self.tokens.items()]
+        return "\n".join(header + ["def _main():"] + self.lines) + "\n"
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def statement(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def expression(self, expr: Expr) -> str:
+        return expr.accept(self)
+
+    # The function emits an indented suite, Python doesn't allow an empty one.
+    def suite(self, stmt: Stmt):
+        self.indent += 1
+        start = len(self.lines)
+        self.statement(stmt)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def token(self, token: Token) -> str:
+        if token not in self.tokens:
+            self.tokens[token] = f"_t{len(self.tokens)}"
+        return self.tokens[token]
+
+    def condition(self, expr: Expr) -> str:
+        while type(expr) is Grouping:
+            expr = expr.expression
+        if type(expr) is Binary and Transpiler.binary_helpers.get(expr.operator.type_) in Transpiler.boolean_helpers:
+            return self.expression(expr)
+        if type(expr) is Unary and expr.operator.type_ == TokenType.BANG:
+            return self.expression(expr)
+        return f"(_t := {self.expression(expr)}) is not None and _t is not False"
+
+    def read(self, declaration: Declaration, token: Token) -> str:
+        if declaration.captured:
+            return f"(_t if (_t := {declaration.pyname}[0]) is not _U else _uninit({self.token(token)}))"
+        if declaration.checked:
+            return f"(_t if (_t := {declaration.pyname}) is not _U else _uninit({self.token(token)}))"
+        return declaration.pyname
+
+    # The function emits the definition of a new variable, locals that are captured get a cell first so closures can refer to it.
+    def define(self, declaration: Declaration, name: Token, value: Expr):
+        if declaration is None:
+            code = "_U" if value is None else self.expression(value)
+            self.emit(f"_G[{name.lexeme!r}] = {code}")
+        elif declaration.captured:
+            self.emit(f"{declaration.pyname} = [_U]")
+            if value is not None:
+                self.emit(f"{declaration.pyname}[0] = {self.expression(value)}")
+        else:
+            self.emit(f"{declaration.pyname} = {'_U' if value is None else self.expression(value)}")
+
+    # The function emits a Python function definition for a Lox function and returns the expression that creates the Lox function.
+    def function_definition(self, function: Function, name: str, is_initializer=False) -> str:
+        info = self.analyzer.infos[function]
+        params = [declaration.pyname for declaration in info.params]
+        if info.this is not None:
+            params.insert(0, info.this.pyname)
+        if info.free:
+            params.append("*")
+            params.extend(f"{declaration.pyname}={declaration.pyname}" for declaration in info.free)
+        self.emit(f"def {info.pyname}({', '.join(params)}):")
+        enclosing = (self.function, self.is_initializer, self.loop_depth)
+        self.function, self.is_initializer, self.loop_depth = info, is_initializer, 0
+        self.indent += 1
+        cells = [declaration for declaration in info.params if declaration.captured]
+        if info.this is not None and info.this.captured:
+            cells.insert(0, info.this)
+        for declaration in cells:
+            self.emit(f"{declaration.pyname} = [{declaration.pyname}]")
+        for statement in function.body:
+            self.statement(statement)
+        self.emit(self.return_line("None"))
+        self.indent -= 1
+        self.function, self.is_initializer, self.loop_depth = enclosing
+        return f"_function({info.pyname}, {name!r}, {len(function.params)}, {function.type_.name!r})"
+
+    # An initializer always returns its instance, whatever the return statement says.
+    def return_line(self, value: str) -> str:
+        if self.is_initializer:
+            this = self.function.this
+            return f"return {this.pyname}[0]" if this.captured else f"return {this.pyname}"
+        return f"return {value}"
+
+    # The function tells whether evaluating the expression can't be observed, so the order of evaluation doesn't matter.
+    def is_pure(self, expr: Expr) -> bool:
+        if type(expr) is Literal:
+            return True
+        if type(expr) is Variable:
+            declaration = self.analyzer.references.get(expr)
+            return declaration is not None and not declaration.captured and not declaration.checked
+        return False
+
+    def visit_expression_stmt(self, stmt: Expression):
+        expr = stmt.expr
+        if type(expr) is Assign:
+            declaration = self.analyzer.references.get(expr)
+            if declaration is not None:
+                target = f"{declaration.pyname}[0]" if declaration.captured else declaration.pyname
+                self.emit(f"{target} = {self.expression(expr.value)}")
+                return
+        self.emit(self.expression(expr))
+
+    def visit_var_stmt(self, stmt: Var):
+        self.define(self.analyzer.declarations.get(stmt), stmt.name, stmt.initializer)
+
+    # Blocks don't need a scope of their own, every declaration was given a unique Python name.
+    def visit_block_stmt(self, stmt: Block):
+        for statement in stmt.statements:
+            self.statement(statement)
+
+    def visit_if_stmt(self, stmt: If):
+        self.emit(f"if {self.condition(stmt.condition)}:")
+        self.suite(stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.emit("else:")
+            self.suite(stmt.else_branch)
+
+    # A function called in the loop which executes a break statement breaks the loop by raising BreakException.
+    def visit_while_stmt(self, stmt: While):
+        self.emit("try:")
+        self.indent += 1
+        self.emit(f"while {self.condition(stmt.condition)}:")
+        self.loop_depth += 1
+        self.suite(stmt.body)
+        self.loop_depth -= 1
+        self.indent -= 1
+        self.emit("except _Break:")
+        self.emit("    pass")
+
+    # A break statement in a function, outside of the function's loops, breaks the loop the function is called in.
+    def visit_break_stmt(self, stmt: Break):
+        self.emit("break" if self.loop_depth > 0 else "raise _Break()")
+
+    def visit_return_stmt(self, stmt: Return):
+        if stmt.value is None:
+            self.emit(self.return_line("None"))
+        elif self.is_initializer:
+            self.emit(self.expression(stmt.value))
+            self.emit(self.return_line("None"))
+        else:
+            self.emit(self.return_line(self.expression(stmt.value)))
+
+    def visit_fun_stmt(self, stmt: Fun):
+        declaration = self.analyzer.declarations.get(stmt)
+        if declaration is not None and declaration.captured:
+            self.emit(f"{declaration.pyname} = [_U]")
+        function = self.function_definition(stmt.function, stmt.name.lexeme)
+        if declaration is None:
+            self.emit(f"_G[{stmt.name.lexeme!r}] = {function}")
+        elif declaration.captured:
+            self.emit(f"{declaration.pyname}[0] = {function}")
+        else:
+            self.emit(f"{declaration.pyname} = {function}")
+
+    def visit_class_stmt(self, stmt: Class):
+        declaration = self.analyzer.declarations.get(stmt)
+        if declaration is None:
+            self.emit(f"_G[{stmt.name.lexeme!r}] = None")
+        elif declaration.captured:
+            self.emit(f"{declaration.pyname} = [None]")
+        else:
+            self.emit(f"{declaration.pyname} = None")
+        super_class = "None"
+        if stmt.super_class is not None:
+            super_class = f"_superclass({self.expression(stmt.super_class)}, {self.token(stmt.super_class.name)})"
+            super_declaration = self.analyzer.declarations[(stmt, "super")]
+            if super_declaration.captured:
+                self.emit(f"{super_declaration.pyname} = [{super_class}]")
+                super_class = f"{super_declaration.pyname}[0]"
+            else:
+                self.emit(f"{super_declaration.pyname} = {super_class}")
+                super_class = super_declaration.pyname
+        methods = [f"{method.name.lexeme!r} : {self.function_definition(method.function, method.name.lexeme, method.name.lexeme == 'init')}"
+                   for method in stmt.methods]
+        class_methods = [f"{method.name.lexeme!r} : {self.function_definition(method.function, method.name.lexeme)}"
+                         for method in stmt.class_methods]
+        klass = f"_class({stmt.name.lexeme!r}, {super_class}, {{{', '.join(methods)}}}, {{{', '.join(class_methods)}}})"
+        if declaration is None:
+            self.emit(f"_G[{stmt.name.lexeme!r}] = {klass}")
+        elif declaration.captured:
+            self.emit(f"{declaration.pyname}[0] = {klass}")
+        else:
+            self.emit(f"{declaration.pyname} = {klass}")
+
+    def visit_assign_expr(self, expr: Assign) -> str:
+        value = self.expression(expr.value)
+        declaration = self.analyzer.references.get(expr)
+        if declaration is None:
+            return f"_set_global({expr.name.lexeme!r}, {value}, {self.token(expr.name)})"
+        if declaration.captured:
+            return f"_set_cell({declaration.pyname}, {value})"
+        return f"({declaration.pyname} := {value})"
+
+    def visit_binary_expr(self, expr: Binary) -> str:
+        left = self.expression(expr.left)
+        right = self.expression(expr.right)
+        if expr.operator.type_ == TokenType.COMMA:
+            return f"({left}, {right})[1]"
+        return f"{Transpiler.binary_helpers[expr.operator.type_]}({left}, {right}, {self.token(expr.operator)})"
+
+    # The tree-walker evaluates both branches before choosing one, and so does the generated code.
+    def visit_conditional_expr(self, expr: Conditional) -> str:
+        return f"_select({self.expression(expr.condition)}, {self.expression(expr.then_branch)}, {self.expression(expr.else_branch)})"
+
+    def visit_grouping_expr(self, expr: Grouping) -> str:
+        return f"({self.expression(expr.expression)})"
+
+    def visit_literal_expr(self, expr: Literal) -> str:
+        return repr(expr.value)
+
+    def visit_logical_expr(self, expr: Logical) -> str:
+        left = self.expression(expr.left)
+        right = self.expression(expr.right)
+        if expr.operator.type_ == TokenType.OR:
+            return f"(_t if (_t := {left}) is not None and _t is not False else {right})"
+        return f"({right} if (_t := {left}) is not None and _t is not False else _t)"
+
+    def visit_unary_expr(self, expr: Unary) -> str:
+        right = self.expression(expr.right)
+        if expr.operator.type_ == TokenType.MINUS:
+            return f"_neg({right})"
+        return f"((_t := {right}) is None or _t is False)"
+
+    def visit_variable_expr(self, expr: Variable) -> str:
+        declaration = self.analyzer.references.get(expr)
+        if declaration is None:
+            name = expr.name.lexeme
+            return f"(_t if (_t := _G.get({name!r}, _U)) is not _U else _global_error({name!r}, {self.token(expr.name)}))"
+        return self.read(declaration, expr.name)
+
+    # A function expression is defined right before the statement that contains it, defining a Python function has no side effects.
+    def visit_function_expr(self, expr: Function) -> str:
+        return self.function_definition(expr, None)
+
+    def visit_call_expr(self, expr: Call) -> str:
+        callee = self.expression(expr.callee)
+        paren = self.token(expr.paren)
+        # The callee has to be checked before the arguments are evaluated, unless evaluating them can't be observed.
+        if not all(self.is_pure(arg) for arg in expr.args):
+            callee = f"_callee({callee}, {paren})"
+        args = "".join(f", {self.expression(arg)}" for arg in expr.args)
+        return f"_call({callee}, {paren}{args})"
+
+    def visit_get_expr(self, expr: Get) -> str:
+        return f"_get({self.expression(expr.obj)}, {self.token(expr.name)})"
+
+    def visit_set_expr(self, expr: Set) -> str:
+        name = self.token(expr.name)
+        return f"_set(_instance({self.expression(expr.obj)}, {name}), {name}, {self.expression(expr.value)})"
+
+    def visit_this_expr(self, expr: This) -> str:
+        return self.read(self.analyzer.references[expr], expr.keyword)
+
+    def visit_super_expr(self, expr: Super) -> str:
+        super_class = self.read(self.analyzer.references[expr], expr.keyword)
+        this = self.read(self.analyzer.super_this[expr], expr.keyword)
+        return f"_super({super_class}, {this}, {self.token(expr.method)})"
@@ -1,11 +1,13 @@
 '''
 The module is used to define the visitor pattern, the visits are implemented in the interpreter and the resolver.
 We use the visitor design pattern to resolve variables, execute statements and evaluate expressions.
+The resolver and the tree-walker visit the nodes through their dispatch tables, indexed by the nodes' kinds, and accept is kept for
+the other visitors.
 '''
 from abc import ABC, abstractmethod
 #from stmt import Stmt, Expression,Print, Var, Block, If, While, Break, Fun, Return, Class
-from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class
-from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super
+from stmt import Stmt, Expression, Var, Block, If, While, Break, Fun, Return, Class, stmt_visits
+from expr import Expr, Assign, Binary, Conditional, Grouping, Literal, Logical, Unary, Variable, Function, Call, Get, Set, This, Super, expr_visits
 
 
 class Visitor(ABC):
@@ -104,3 +106,8 @@ class Visitor(ABC):
     @abstractmethod
     def visit_break_stmt(self, stmt: Break):
         pass
+
+    # The function returns the visitor's dispatch table - its visit functions at the kinds of the nodes they visit - so a node is visited
+    # with a single indexed lookup, visits[node.kind](node), instead of calling the node's accept function which calls back the visitor.
+    def dispatch_table(self) -> list:
+        return [getattr(self, name) for name in expr_visits + stmt_visits]
@@ -0,0 +1,349 @@
+'''
+The module serves as the bytecode virtual machine, an alternative to the tree-walker that executes the chunks produced by compiler.py
+in a single dispatch loop.
+The machine reuses the interpreter's globals, resolution tables, environments and value helpers, and its runtime objects - classes,
+instances and functions - are the same ones the tree-walker creates, so both engines produce the same output and runtime errors.
+Calls between Lox functions don't recurse in Python, the machine saves the caller's state in a frame list and keeps looping.
+'''
+from typing import Any
+from stmt import Stmt
+from expr import Function
+from error import LoxRunTimeError, DivisionByZeroError, BreakException
+from error_handler import ErrorHandler
+from environment import Environment
+from run_mode import RunMode
+from Lox_callable import LoxCallable
+from Lox_function import LoxFunction
+from Lox_class import LoxClass
+from Lox_instance import LoxInstance
+from interpreter import Interpreter
+from numeric import divide, negate, add, subtract, multiply
+from compiler import Compiler, Chunk
+from op_code import *
+
+# The deepest call stack the machine allows before reporting a stack overflow.
+MAX_FRAMES = 10000
+
+
+# A Lox function whose body was compiled into a chunk.
+class VMFunction(LoxFunction):
+    __slots__ = ("chunk",)
+
+    def __init__(self, name: str, chunk: Chunk, closure: Environment, is_ini=False):
+        super().__init__(name, chunk.declaration, closure, is_ini)
+        self.chunk = chunk
+
+    def call(self, interpreter, arguments: list[Any]):
+        environment = Environment(self.closure)
+        environment.vars = list(arguments)
+        return interpreter.run(self.chunk, environment, self)
+
+    # This function binds a function to an instance.
+    def bind(self, instance):
+        environment = Environment(self.closure)
+        environment.define(instance)
+        if type(self.is_ini) is bool and self.is_ini:
+            return VMFunction(self.name, self.chunk, environment, len(environment.vars)-1)
+        return VMFunction(self.name, self.chunk, environment, self.is_ini)
+
+
+# The function unwinds the machine's frames and stack to the innermost running loop, which a function called in it broke, and returns
+# the state to continue after the loop in. A break with no loop running in this run of the machine is raised to the one that called it.
+def break_loop(loops: list, frames: list, stack: list) -> tuple:
+    if not loops:
+        raise BreakException()
+    depth, function, code, constants, env, height, ip = loops.pop()
+    del frames[depth:]
+    del stack[height:]
+    return function, code, constants, env, ip
+
+
+class VM(Interpreter):
+    def __init__(self, error_handler: ErrorHandler):
+        super().__init__(error_handler)
+
+    def interpret(self, statements: list[Stmt], mode: RunMode):
+        try:
+            chunk = Compiler(self, mode).compile(statements)
+            self.run(chunk, None, None)
+        except LoxRunTimeError as error:
+            self.error_handler.runtime_error(error)
+
+    # The function executes a chunk until its outermost frame returns, and returns the returned value.
+    def run(self, chunk: Chunk, environment: Environment, function: VMFunction) -> Any:
+        globals_ = self.globals
+        uninitialized = Interpreter.uninitialized
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+        # The running loops, each with the state to continue in after the loop.
+        loops = []
+        code = chunk.code
+        constants = chunk.constants
+        env = environment
+        ip = 0
+        while True:
+            instruction = code[ip]
+            # The instructions are grouped by their opcode ranges - loads and stores, operators, control flow and objects - so
+            # that reaching any instruction takes a few integer comparisons, and within a group the frequent ones come first.
+            if instruction <= DEFINE_GLOBAL:
+                if instruction == GET_LOCAL:
+                    value = env.vars[code[ip+1]]
+                    if value is uninitialized:
+                        raise LoxRunTimeError(constants[code[ip+2]], "Variable must be initialized before use.")
+                    push(value)
+                    ip += 3
+                elif instruction == CONSTANT:
+                    push(constants[code[ip+1]])
+                    ip += 2
+                elif instruction == GET_GLOBAL:
+                    name = constants[code[ip+1]]
+                    if name.lexeme not in globals_:
+                        raise LoxRunTimeError(name, f"Undefined variable {name.lexeme}.")
+                    value = globals_[name.lexeme]
+                    if value is uninitialized:
+                        raise LoxRunTimeError(name, "Variable must be initialized before use.")
+                    push(value)
+                    ip += 2
+                elif instruction == GET_UPPER:
+                    ancestor = env
+                    for _ in range(code[ip+1]):
+                        ancestor = ancestor.enclosing
+                    value = ancestor.vars[code[ip+2]]
+                    if value is uninitialized:
+                        raise LoxRunTimeError(constants[code[ip+3]], "Variable must be initialized before use.")
+                    push(value)
+                    ip += 4
+                elif instruction == POP:
+                    pop()
+                    ip += 1
+                elif instruction == SET_LOCAL:
+                    env.vars[code[ip+1]] = stack[-1]
+                    ip += 2
+                elif instruction == SET_UPPER:
+                    ancestor = env
+                    for _ in range(code[ip+1]):
+                        ancestor = ancestor.enclosing
+                    ancestor.vars[code[ip+2]] = stack[-1]
+                    ip += 3
+                elif instruction == SET_GLOBAL:
+                    name = constants[code[ip+1]]
+                    if name.lexeme not in globals_:
+                        raise LoxRunTimeError(name, f"Undefined variable {name.lexeme}.")
+                    globals_[name.lexeme] = stack[-1]
+                    ip += 2
+                elif instruction == DEFINE_LOCAL:
+                    env.vars.append(pop())
+                    ip += 1
+                else:
+                    globals_[constants[code[ip+1]]] = pop()
+                    ip += 2
+            elif instruction <= NOT_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if instruction == ADD:
+                    if (type(left) is float or type(left) is int) and (type(right) is float or type(right) is int):
+                        stack[-1] = add(left, right)
+                    elif type(left) is str or type(right) is str:
+                        stack[-1] = self.stringify(left) + self.stringify(right)
+                    else:
+                        raise LoxRunTimeError(constants[code[ip+1]], "Operands must either strings or numbers.")
+                    ip += 2
+                elif instruction <= DIVIDE:
+                    if instruction == DIVIDE and right == 0:
+                        raise DivisionByZeroError(constants[code[ip+1]])
+                    if (type(left) is not float and type(left) is not int) or (type(right) is not float and type(right) is not int):
+                        raise LoxRunTimeError(constants[code[ip+1]], "Operands must be numbers.")
+                    if instruction == SUBTRACT:
+                        stack[-1] = subtract(left, right)
+                    elif instruction == MULTIPLY:
+                        stack[-1] = multiply(left, right)
+                    else:
+                        stack[-1] = divide(left, right)
+                    ip += 2
+                else:
+                    if not ((type(left) is str and type(right) is str) or
+                            ((type(left) is float or type(left) is int) and (type(right) is float or type(right) is int))):
+                        raise LoxRunTimeError(constants[code[ip+1]], "Operands must all be of the same type.")
+                    if instruction == LESS:
+                        stack[-1] = left < right
+                    elif instruction == LESS_EQUAL:
+                        stack[-1] = left <= right
+                    elif instruction == GREATER:
+                        stack[-1] = left > right
+                    elif instruction == GREATER_EQUAL:
+                        stack[-1] = left >= right
+                    elif instruction == EQUAL:
+                        stack[-1] = left == right
+                    else:
+                        stack[-1] = left != right
+                    ip += 2
+            elif instruction <= SELECT:
+                value = stack[-1]
+                if instruction == NOT:
+                    stack[-1] = value is None or value is False
+                elif instruction == NEGATE:
+                    stack[-1] = negate(value)
+                else:
+                    # The value on top is the else branch, below it are the then branch and the condition.
+                    pop()
+                    then_value = pop()
+                    condition = stack[-1]
+                    stack[-1] = value if condition is None or condition is False else then_value
+                ip += 1
+            elif instruction <= POP_ENV:
+                if instruction == JUMP_IF_FALSE:
+                    value = pop()
+                    if value is None or value is False:
+                        ip = code[ip+1]
+                    else:
+                        ip += 2
+                elif instruction == JUMP:
+                    ip = code[ip+1]
+                elif instruction == PUSH_ENV:
+                    env = Environment(env)
+                    ip += 1
+                elif instruction == POP_ENV:
+                    for _ in range(code[ip+1]):
+                        env = env.enclosing
+                    ip += 2
+                elif instruction == JUMP_IF_FALSE_OR_POP:
+                    value = stack[-1]
+                    if value is None or value is False:
+                        ip = code[ip+1]
+                    else:
+                        pop()
+                        ip += 2
+                else:
+                    value = stack[-1]
+                    if value is None or value is False:
+                        pop()
+                        ip += 2
+                    else:
+                        ip = code[ip+1]
+            elif instruction == CALL:
+                count = code[ip+1]
+                if count:
+                    arguments = stack[-count:]
+                    del stack[-count:]
+                else:
+                    arguments = []
+                callee = pop()
+                if type(callee) is LoxClass:
+                    # Instantiating a class whose initializer is compiled runs the initializer in a new frame as well.
+                    initializer = callee.initializer
+                    if type(initializer) is VMFunction:
+                        callee = initializer.bind(LoxInstance(callee))
+                if type(callee) is VMFunction:
+                    if count != len(callee.declaration.params):
+                        raise LoxRunTimeError(constants[code[ip+2]], f"Expected {callee.arity()} arguments but got {count}.")
+                    if len(frames) >= MAX_FRAMES:
+                        raise LoxRunTimeError(constants[code[ip+2]], "Stack overflow.")
+                    frames.append((function, code, constants, ip + 3, env))
+                    function = callee
+                    code = callee.chunk.code
+                    constants = callee.chunk.constants
+                    env = Environment(callee.closure)
+                    env.vars = arguments
+                    ip = 0
+                    continue
+                if not isinstance(callee, LoxCallable):
+                    raise LoxRunTimeError(constants[code[ip+2]], "Can only call functions and classes.")
+                if count != callee.arity():
+                    raise LoxRunTimeError(constants[code[ip+2]], f"Expected {callee.arity()} arguments but got {count}.")
+                try:
+                    push(callee.call(self, arguments))
+                except BreakException:
+                    function, code, constants, env, ip = break_loop(loops, frames, stack)
+                    continue
+                ip += 3
+            elif instruction == RETURN:
+                value = pop()
+                if function is not None and type(function.is_ini) is int:
+                    value = function.closure.get_at(0, function.is_ini)
+                if not frames:
+                    return value
+                # The loops the function returned from are left.
+                depth = len(frames)
+                while loops and loops[-1][0] == depth:
+                    loops.pop()
+                function, code, constants, ip, env = frames.pop()
+                push(value)
+            elif instruction == GET_PROPERTY:
+                obj = stack[-1]
+                if not isinstance(obj, LoxInstance):
+                    raise LoxRunTimeError(constants[code[ip+1]], "Only instances have properties.")
+                result = obj.get(constants[code[ip+1]])
+                if isinstance(result, LoxFunction) and result.is_getter():
+                    try:
+                        result = result.call(self, [])
+                    except BreakException:
+                        function, code, constants, env, ip = break_loop(loops, frames, stack)
+                        continue
+                stack[-1] = result
+                ip += 2
+            elif instruction == CHECK_CALLABLE:
+                if not isinstance(stack[-1], LoxCallable):
+                    raise LoxRunTimeError(constants[code[ip+1]], "Can only call functions and classes.")
+                ip += 2
+            elif instruction == SET_PROPERTY:
+                value = pop()
+                stack[-1].set(constants[code[ip+1]], value)
+                stack[-1] = value
+                ip += 2
+            elif instruction == CHECK_INSTANCE:
+                if not isinstance(stack[-1], LoxInstance):
+                    raise LoxRunTimeError(constants[code[ip+1]], "Only instances have properties.")
+                ip += 2
+            elif instruction == GET_SUPER:
+                ancestor = env
+                for _ in range(code[ip+1] - 1):
+                    ancestor = ancestor.enclosing
+                obj = ancestor.vars[0]
+                super_class = ancestor.enclosing.vars[code[ip+2]]
+                method_name = constants[code[ip+3]]
+                method = super_class.find_method(method_name.lexeme)
+                if method is None:
+                    raise LoxRunTimeError(method_name, f"Undefined propery {method_name.lexeme}.")
+                push(method.bind(obj))
+                ip += 4
+            elif instruction == CLOSURE:
+                closure = constants[code[ip+1]]
+                push(VMFunction(closure.name, closure, env))
+                ip += 2
+            elif instruction == CLASS:
+                self.create_class(constants[code[ip+1]], stack, env)
+                ip += 2
+            elif instruction == ECHO:
+                print(self.stringify(pop()))
+                ip += 1
+            elif instruction == LOOP:
+                loops.append((len(frames), function, code, constants, env, len(stack), code[ip+1]))
+                ip += 2
+            elif instruction == END_LOOP:
+                loops.pop()
+                ip += 1
+            elif instruction == BREAK_OUT:
+                function, code, constants, env, ip = break_loop(loops, frames, stack)
+            else:
+                raise RuntimeError(f"Unknown instruction {instruction}.")
+
+    # The function creates a class the same way the tree-walker's visit_class_stmt does, and stores it in its variable.
+    def create_class(self, klass_chunk, stack: list, environment: Environment):
+        super_class = None
+        closure = environment
+        if klass_chunk.super_class is not None:
+            super_class = stack.pop()
+            if not isinstance(super_class, LoxClass):
+                raise LoxRunTimeError(klass_chunk.super_class, "Superclass must be a class.")
+            closure = Environment(environment)
+            closure.define(super_class)
+        class_methods = {name: VMFunction(name, chunk, closure, False) for name, chunk in klass_chunk.class_methods}
+        metaclass = LoxClass(None, None, f'{klass_chunk.name.lexeme}metaclass', class_methods)
+        methods = {name: VMFunction(name, chunk, closure, name == 'init') for name, chunk in klass_chunk.methods}
+        klass = LoxClass(metaclass, super_class, klass_chunk.name.lexeme, methods)
+        if environment:
+            environment.vars[klass_chunk.slot] = klass
+        else:
+            self.globals[klass_chunk.name.lexeme] = klass
@@ -4,6 +4,8 @@ def define_import(outf, base_name: str):
     outf.write("from abc import ABC, abstractmethod\n")
     if base_name == 'Expr':
         outf.write("from typing import Any\n")
+        outf.write("from function_type import FunctionType\n")
+        outf.write("from var_state import VarState\n")
     elif base_name == 'Stmt':
         outf.write("from expr import Expr\n")
     if not base_name == 'visitor':
@@ -12,19 +14,32 @@ def define_import(outf, base_name: str):
 def define_base_class(outf, base_name: str):
     outf.write(f"class {base_name}:")
     outf.write("\n")
-    outf.write("    pass\n\n")
+    outf.write("    __slots__ = ()\n\n")
 
-def define_sub_classes(outf,base_name: str,types: list[str]):
-    for type_ in types:
+# The kinds of the classes are numbered from the first kind, and the names of their visit functions are listed in the order of their kinds.
+def define_sub_classes(outf,base_name: str,types: list[str], first_kind: int):
+    visits = []
+    for kind, type_ in enumerate(types, first_kind):
         split_str = type_.split("|")
         type_name = split_str[0].strip()
         type_fields = split_str[1].strip()
-        define_type(outf, base_name ,type_name, type_fields)
+        annotations = split_str[2].strip() if len(split_str) > 2 else ""
+        define_type(outf, base_name ,type_name, type_fields, annotations, kind)
         outf.write("\n")
+        visits.append(f"visit_{type_name.lower()}_{base_name.lower()}")
+    outf.write(f"\n# The names of the visit functions, in the order of their kinds.\n")
+    outf.write(f"{base_name.lower()}_visits = {visits!r}\n")
     
 
-def define_type(outf, base_name: str, type_name: list[str], type_fields: list[str]):
+# The annotations are the fields the resolver, the optimizer and the tree-walker fill in, written as "name = initial value".
+# All of the fields are declared in slots, so the nodes have no __dict__.
+def define_type(outf, base_name: str, type_name: list[str], type_fields: list[str], annotations: str, kind: int):
+        field_names = [field.split(":")[0].strip() for field in type_fields.split(", ") if field]
+        annotations = [annotation.split("=") for annotation in annotations.split(", ") if annotation]
+        slots = field_names + [annotation[0].strip() for annotation in annotations]
         outf.write(f"class {type_name}({base_name}):\n")
+        outf.write(f"    __slots__ = ({''.join(repr(slot) + ', ' for slot in slots).rstrip()})\n")
+        outf.write(f"    kind = {kind}\n\n")
         outf.write(f"    def __init__(self")
         if not type_fields:
             fields = ""
@@ -38,6 +53,8 @@ def define_type(outf, base_name: str, type_name: list[str], type_fields: list[st
             field_name = field[0].strip()
             outf.write(f"        self.{field_name} = {field_name}")
             outf.write("\n")
+        for annotation_name, initial_value in annotations:
+            outf.write(f"        self.{annotation_name.strip()} = {initial_value.strip()}\n")
         outf.write("\n    def accept(self, visitor) -> str:\n")
         outf.write(f"        return visitor.visit_{type_name.lower()}_{base_name.lower()}(self)\n")
 
@@ -49,14 +66,16 @@ def add_visit(visitor_lines, base_name: str, types: list[str]):
                             f"{type_name}) -> str:\n")
         visitor_lines.append("        pass\n\n")
 
-def define_ast(out_dir, base_name: str, types: list[str], visitor_lines: list[str]):
+# The function returns the kind that the next classes' kinds start from.
+def define_ast(out_dir, base_name: str, types: list[str], visitor_lines: list[str], first_kind: int) -> int:
     path = f"{out_dir}\{base_name.lower()}.py"
     outf = open(path, mode='w+', encoding='utf-8')
     define_import(outf, base_name)
     define_base_class(outf,base_name)
-    define_sub_classes(outf, base_name,types)
+    define_sub_classes(outf, base_name,types, first_kind)
     visitor_lines.insert(0,f"from {base_name.lower()} import * \n")
     add_visit(visitor_lines, base_name, types)
+    return first_kind + len(types)
     
 
 def define_visitor(out_dir, visitor_lines: list[str]):
@@ -68,6 +87,8 @@ def define_visitor(out_dir, visitor_lines: list[str]):
         outf.write(line)
         if line == visitor_lines[1]:
             outf.write("\n")
+    outf.write("    def dispatch_table(self) -> list:\n")
+    outf.write("        return [getattr(self, name) for name in expr_visits + stmt_visits]\n")
     outf.close()
 
 
@@ -82,28 +103,33 @@ def main():
     args ="d:/Programming/Crafting Interpreters/Tree Walker/src/pylox"
     visitor_lines = ["\nclass Visitor(ABC):\n"]
 
-    define_ast(args, "Expr",
-               ["Asign | name: Token, value: Expr",
-                "Binary | left: Expr, operator: Token,  right: Expr",
-                "Conditional | condition: Expr, left: Expr, right: Expr",
+    address = "depth = None, slot = None, access = None, index = None"
+    kind = define_ast(args, "Expr",
+               [f"Assign | name: Token, value: Expr | {address}",
+                "Binary | left: Expr, operator: Token, right: Expr | specialization = None, specializations = 0",
+                "Conditional | condition: Expr, then_branch: Expr, else_branch: Expr",
                 "Grouping | expression: Expr",
                 "Literal | value: Any",
-                "Logical |  left: Expr, operator: Token, right: Expr",
+                "Logical | left: Expr, operator: Token, right: Expr",
                 "Unary | operator: Token, right: Expr",
-                "Variable | name: Token",
-                "Function | params: list[Token], body: list[Any]",
-                "Call | callee: Expr, paren: Token, args: list[Expr]"], visitor_lines)
+                f"Variable | name: Token, state: VarState = VarState.READ | {address}",
+                "Function | params: list[Token], body: list[Any], type_: FunctionType | frame_size = 0, upvalues = [], this_index = None, cells = [], encloses = False, frames = [], inline = False",
+                "Call | callee: Expr, paren: Token, args: list[Expr] | target = None, tail = False",
+                "Get | obj: Expr, name: Token | methods = {}, shape = None, index = None",
+                "Set | obj: Expr, name: Token, value: Expr | shape = None, index = None, transition = None",
+                f"This | keyword: Token | {address}",
+                f"Super | keyword: Token, method: Token | {address}, this_index = None"], visitor_lines, 0)
 
     define_ast(args, "Stmt", [
                "Expression | expr: Expr",
-               "Print | expr: Expr",
-               "Var | name: Token, initializer: Expr",
-               "Block | statements: list[Stmt]",
+               "Var | name: Token, initializer: Expr | access = None, index = None",
+               "Block | statements: list[Stmt] | scoped = True",
                "If | condition: Expr, then_branch: Stmt, else_branch: Stmt",
-               "Fun | name: Token, function",
+               "Fun | name: Token, function: Expr | access = None, index = None",
                "Return | keyword: Token, value: Expr",
-               "While | condition: Expr, body: Stmt",
-               "Break |"], visitor_lines)
+               f"Class | name: Token, super_class: Expr, methods: list[Stmt], class_methods: list[Stmt] | {address}, super_index = None",
+               "While | condition: Expr, body: Stmt | counted = None",
+               "Break |"], visitor_lines, kind)
 
     define_visitor(args, visitor_lines)
 
@@ -0,0 +1,54 @@
+'''
+The script reports the memory that a Lox program takes once it's scanned, parsed and resolved - the form the interpreter holds it in
+for as long as it runs - and the peak memory of the objects the program creates while it runs.
+Running it on the same program before and after a change to the interpreter's classes measures how the change affects their layout.
+Usage: python memory_report.py <path to a Lox source file>
+'''
+import io
+import os
+import sys
+import tracemalloc
+import contextlib
+
+# The interpreter's token module shadows Python's, which is already imported by the time the script runs.
+sys.modules.pop("token", None)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pyLox"))
+from error_handler import ErrorHandler
+from scanner import Scanner
+from Lox_parser import Parser
+from resolver import Resolver
+from interpreter import Interpreter
+from run_mode import RunMode
+from optimizer import walk
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python memory_report.py <path to a Lox source file>")
+        sys.exit(64)
+    with open(sys.argv[1], "r") as f:
+        source = f.read()
+    error_handler = ErrorHandler()
+    interpreter = Interpreter(error_handler)
+    tracemalloc.start()
+    tokens = Scanner(error_handler, source).scan_tokens()
+    tokens_size = tracemalloc.get_traced_memory()[0]
+    statements = Parser(tokens, error_handler).parse()
+    del tokens
+    Resolver(interpreter, error_handler).resolve_program(statements)
+    if error_handler.had_error:
+        sys.exit(65)
+    program_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret(statements, RunMode.FILE)
+    runtime_size = tracemalloc.get_traced_memory()[1] - program_size
+    tracemalloc.stop()
+    nodes = sum(1 for _ in walk(statements))
+    print(f"Tokens:                {tokens_size:>12,} bytes")
+    print(f"Resolved program:      {program_size:>12,} bytes, {nodes:,} nodes, {program_size // max(nodes, 1)} bytes per node")
+    print(f"Peak while running:    {runtime_size:>12,} bytes")
+
+
+if __name__ == "__main__":
+    main()